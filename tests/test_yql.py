@@ -0,0 +1,49 @@
+"""Checks the hand written yql parser against the pyparsing grammar it replaced."""
+import random
+import unittest
+
+try:
+	import pyparsing
+	PYPARSING_EXISTS = True
+except ImportError:
+	PYPARSING_EXISTS = False
+
+from ygo import yql
+
+# every kind of token the grammar knows, in mixed case, plus the near misses that tell keywords from words
+VOCABULARY = yql.CARD_KEYS + yql.CARD_PROPERTIES + [
+	'true', 'false', 'and', 'or', 'not', 'AND', 'Or', 'NOT', 'Monster', 'TYPE', 'Quick-Play',
+	'=', '<', '>', '~', '7', '2000', 'Dragon', 'Blue-Eyes', '-', 'x_y', '$', '7monster', 'monsterx', 'level7',
+	'"x y"', '"a""b"', '"a\\"b"', '"', '"tab\there"', '(', ')']
+
+SEPARATORS = ['', ' ', ' ', '\t', '\n']
+
+QUERIES = 30000
+
+def _result(compile, text):
+	# the tree a parser builds for a query, or None if it rejects the query
+	try:
+		return str(compile(text))
+	except (yql.YQLSyntaxError, pyparsing.ParseBaseException):
+		return None
+
+def _random_query(rng):
+	tokens = rng.randint(1, 8)
+	return ''.join(rng.choice(VOCABULARY) + rng.choice(SEPARATORS) for i in range(tokens))
+
+@unittest.skipUnless(PYPARSING_EXISTS, 'the reference grammar needs pyparsing')
+class TestParser(unittest.TestCase):
+	def test_examples(self):
+		for text in ['level 7 synchro', 'type = "Fiend"', 'type Fiend', 'attack > 2000 or not monster', 'name ~ "HERO" and level < 5 spell']:
+			expected = _result(yql.compile_yql_pyparsing, text)
+			self.assertIsNotNone(expected, text)
+			self.assertEqual(_result(yql._compile, text), expected, text)
+
+	def test_random_queries(self):
+		rng = random.Random(7)
+		for i in range(QUERIES):
+			text = _random_query(rng)
+			self.assertEqual(_result(yql._compile, text), _result(yql.compile_yql_pyparsing, text), repr(text))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,101 @@
+"""Fetches prices from a stub price api on localhost."""
+import sys
+import json
+import time
+import threading
+import unittest
+
+if sys.version_info.major == 2:
+	from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+	from SocketServer import ThreadingMixIn
+	from urllib import unquote_plus
+else:
+	from http.server import HTTPServer, BaseHTTPRequestHandler
+	from socketserver import ThreadingMixIn
+	from urllib.parse import unquote_plus
+
+from ygo import yugiohprices
+from ygo.card import YugiohCard
+
+# seconds every stub response takes, so that concurrent requests overlap
+DELAY = 0.05
+
+class StubServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+	def __init__(self):
+		HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+		self.lock = threading.Lock()
+		self.requests = []
+		self.active = 0
+		self.peak = 0
+
+class StubHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		server = self.server
+		name = unquote_plus(self.path.rsplit('/', 1)[1])
+		with server.lock:
+			server.requests.append(name)
+			server.active += 1
+			server.peak = max(server.peak, server.active)
+		time.sleep(DELAY)
+		with server.lock:
+			server.active -= 1
+		run = {
+			'print_tag': name[:4] + '-001',
+			'rarity': 'Rare',
+			'price_data': {'status': 'success', 'data': {'prices': {'average': float(len(name))}, 'listings': []}},
+		}
+		body = json.dumps({'status': 'success', 'data': [run]}).encode('utf-8')
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+def make_card(i, name):
+	return YugiohCard(name, '', str(i), 17, None, None, 0, 0, 4, None, None)
+
+class TestGetPriceDataMany(unittest.TestCase):
+	def setUp(self):
+		self.server = StubServer()
+		self.thread = threading.Thread(target=self.server.serve_forever)
+		self.thread.daemon = True
+		self.thread.start()
+		self.api_url = yugiohprices.API_URL
+		yugiohprices.API_URL = 'http://127.0.0.1:{0}/api/get_card_prices/'.format(self.server.server_port)
+
+	def tearDown(self):
+		yugiohprices.API_URL = self.api_url
+		self.server.shutdown()
+		self.server.server_close()
+
+	def test_order_and_dedup(self):
+		names = ['Card {0}'.format('x' * i) for i in range(12)]
+		cards = [make_card(i, name) for (i, name) in enumerate(names)]
+		# every card twice, the second time in reverse
+		asked = cards + cards[::-1]
+		result = yugiohprices.get_price_data_many(asked)
+		self.assertEqual(len(result), len(asked))
+		for (card, data) in zip(asked, result):
+			self.assertEqual(len(data), 1)
+			self.assertEqual(data[0].name, card.name)
+			self.assertEqual(data[0].price.average, float(len(card.name)))
+		self.assertEqual(sorted(self.server.requests), sorted(names))
+
+	def test_per_host_limit(self):
+		cards = [make_card(i, 'Card {0}'.format(i)) for i in range(4 * yugiohprices.PER_HOST)]
+		yugiohprices.get_price_data_many(cards, max_workers=4 * yugiohprices.PER_HOST)
+		self.assertEqual(len(self.server.requests), len(cards))
+		self.assertLessEqual(self.server.peak, yugiohprices.PER_HOST)
+		self.assertGreater(self.server.peak, 1)
+
+	def test_empty(self):
+		self.assertEqual(yugiohprices.get_price_data_many([]), [])
+		self.assertEqual(self.server.requests, [])
+
+if __name__ == '__main__':
+	unittest.main()
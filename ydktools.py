@@ -73,7 +73,10 @@ def get_input(session, args):
 			return result
 
 	elif args.query is not None:
-		cards = session.yql(args.query)
+		# the first query is answered by the database, and every further one narrows its result
+		cards = session.yql(args.query[0])
+		for query in args.query[1:]:
+			cards = session.yql(query, cards)
 		return ygo.deck.YugiohDeck(main=ygo.deck.YugiohSet(cards))
 
 	elif args.name is not None:
@@ -115,8 +118,13 @@ def _cheapest(cards):
 			least = card.price.average
 	return least
 
-def display_card_price(session, lines, indent, card, count, get_price, rarity):
-	price_data = session.price_data(card)
+def fetch_prices(session, cards):
+	# look up the prices of every card at once, instead of one request after another
+	cards = list(cards)
+	return dict(zip(cards, session.price_data_many(cards)))
+
+def display_card_price(prices, lines, indent, card, count, get_price, rarity):
+	price_data = prices[card]
 	price = get_price(price_data)
 	price_str = ygo.abstract.format_money(price)
 	if rarity:
@@ -137,9 +145,10 @@ def display_card_price(session, lines, indent, card, count, get_price, rarity):
 def display_set_price(session, cardset, get_price, rarity):
 	total = 0
 	lines = ['All Cards ({price})']
+	prices = fetch_prices(session, cardset)
 	for card in sorted(cardset, key=_default_sort_key):
 		count = cardset.count(card)
-		total += display_card_price(session, lines, 4, card, count, get_price, rarity)
+		total += display_card_price(prices, lines, 4, card, count, get_price, rarity)
 	output = os.linesep.join(lines)
 	output = output.format(price=ygo.abstract.format_money(total))
 	sys.stdout.write(output+'\n')
@@ -156,31 +165,32 @@ def display_deck_price(session, deck, get_price, rarity):
 		'total': 0
 	}
 
+	prices = fetch_prices(session, list(deck.main) + list(deck.extra) + list(deck.side))
 	lines = ['Main Deck ({main})']
 	lines.append('    Monsters ({monster})')
 	for monster in deck.main.monsters():
 		count = deck.main.count(monster)
-		info['monster'] += display_card_price(session, lines, 8, monster, count, get_price, rarity)
+		info['monster'] += display_card_price(prices, lines, 8, monster, count, get_price, rarity)
 
 	lines.append('    Spells ({spell})')
 	for spell in deck.main.spells():
 		count = deck.main.count(spell)
-		info['spell'] += display_card_price(session, lines, 8, spell, count, get_price, rarity)
+		info['spell'] += display_card_price(prices, lines, 8, spell, count, get_price, rarity)
 	
 	lines.append('    Traps ({trap})')
 	for trap in deck.main.traps():
 		count = deck.main.count(trap)
-		info['trap'] += display_card_price(session, lines, 8, trap, count, get_price, rarity)
+		info['trap'] += display_card_price(prices, lines, 8, trap, count, get_price, rarity)
 
 	lines.append('Extra ({extra})')
 	for monster in deck.extra:
-		count = deck.main.count(monster)
-		info['extra'] += display_card_price(session, lines, 4, monster, count, get_price, rarity)
+		count = deck.extra.count(monster)
+		info['extra'] += display_card_price(prices, lines, 4, monster, count, get_price, rarity)
 
 	lines.append('Side ({side})')
 	for card in deck.side:
-		count = deck.main.count(card)
-		info['side'] += display_card_price(session, lines, 4, card, count, get_price, rarity)
+		count = deck.side.count(card)
+		info['side'] += display_card_price(prices, lines, 4, card, count, get_price, rarity)
 	lines.append('Total ({total})')
 
 	info['main'] = info['monster'] + info['spell'] + info['trap']
@@ -191,13 +201,18 @@ def display_deck_price(session, deck, get_price, rarity):
 	sys.stdout.write(output+'\n')
 
 if __name__ == '__main__':
-	session = ygo.Session(YGOPRO_PATH)
+	# start from the decoded card snapshot instead of rebuilding every card from cards.cdb,
+	# and only ask the price api about each card once a day. Expired prices are refetched
+	# before they are shown, since the program exits before a background refresh could land.
+	prices = ygo.pricecache.PriceCache(os.path.join(YGOPRO_PATH, 'prices.sqlite'), stale_while_revalidate=False)
+	session = ygo.Session(YGOPRO_PATH, cache=True, price_cache=prices)
 	parser = construct_parser()
 	args = parser.parse_args()
 
-	deck = get_input(session, args)
-	if deck is not None:
-		display_info(session, args, deck)
-	
-		write_output(session, args, deck)
+	with session:
+		deck = get_input(session, args)
+		if deck is not None:
+			display_info(session, args, deck)
+		
+			write_output(session, args, deck)
 	
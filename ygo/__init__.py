@@ -18,5 +18,14 @@ from . import card
 # Someday this will do cool things
 from . import consistency
 
+# Estimates consistency by sampling hands, for problems too big to count exactly
+from . import montecarlo
+
+# Plays out the first turns of a deck with draw and search effects
+from . import simulation
+
+# Prices whole batches of decks from a price snapshot
+from . import valuation
+
 # Create and use yql filters
 from . import yql
@@ -1,31 +1,339 @@
 import sys
 import json
+import time
+import zlib
+import socket
+import codecs
 import locale
+import threading
 
 locale.setlocale(locale.LC_ALL, '')
 
 if sys.version_info.major == 2:
-	from urllib import urlopen, quote_plus
+	from urllib import quote_plus
+	from urlparse import urlsplit, urljoin
+	import httplib
 elif sys.version_info.major == 3:
-	from urllib.request import urlopen
-	from urllib.parse import quote_plus
+	from urllib.parse import quote_plus, urlsplit, urljoin
+	import http.client as httplib
 else:
 	svi = sys.version_info
 	raise NotImplementedError('Python version {0}.{1}.{3} not supported'.format(sys.version_info.major, sys.version_info.minor, sys.version_info.micro))
 
+# seconds to wait for a connection or a read before giving up
+TIMEOUT = 10
+
+# the most times a failed request is tried again
+RETRIES = 3
+
+# seconds before the first retry, doubled for every retry after it
+BACKOFF = 0.5
+
+# idle connections kept open per host
+MAX_IDLE = 8
+
+MAX_REDIRECTS = 5
+
+CHUNK_SIZE = 64 * 1024
+
+# responses worth asking again for
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+
+class HTTPError(IOError):
+	"""A request that failed. An IOError, like the errors urlopen raises, so callers that handle network errors handle these too."""
+	def __init__(self, message, status=None):
+		IOError.__init__(self, message)
+		self.status = status
+
+class Response(object):
+	"""A response body being read from a pooled connection. Reading it decompresses gzip on the fly, and closing it (or reading it to the end) hands the connection back to the pool."""
+	def __init__(self, client, key, connection, response):
+		self.status = response.status
+		self._client = client
+		self._key = key
+		self._connection = connection
+		self._response = response
+		self._inflate = None
+		if (response.getheader('Content-Encoding') or '').lower() == 'gzip':
+			# 16 + MAX_WBITS expects a gzip header
+			self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+	def chunks(self, size=CHUNK_SIZE):
+		"""
+		:returns: the body, decompressed, a piece at a time
+		:rtype: iterator of bytes
+		"""
+		try:
+			while True:
+				data = self._response.read(size)
+				if not data:
+					break
+				if self._inflate is not None:
+					data = self._inflate.decompress(data)
+				if data:
+					yield data
+			if self._inflate is not None:
+				rest = self._inflate.flush()
+				if rest:
+					yield rest
+		finally:
+			self.close()
+
+	def read(self):
+		return b''.join(self.chunks())
+
+	def _decoded(self, encoding):
+		# the body as text, a piece at a time
+		decoder = codecs.getincrementaldecoder(encoding)()
+		for chunk in self.chunks():
+			text = decoder.decode(chunk)
+			if text:
+				yield text
+		rest = decoder.decode(b'', True)
+		if rest:
+			yield rest
+
+	def text(self, encoding='utf-8'):
+		"""
+		:returns: the body, decoded
+		:rtype: str
+		"""
+		return ''.join(self._decoded(encoding))
+
+	def json(self, encoding='utf-8'):
+		"""
+		:returns: the body parsed as json while it is read. Only the value being parsed is held as text, never the whole body.
+		:raises ValueError: if the body is not json
+		"""
+		return _JSONReader(self._decoded(encoding)).document()
+
+	def close(self):
+		if self._connection is None:
+			return
+		reusable = self._response.isclosed() and not self._response.will_close
+		if reusable:
+			self._client._release(self._key, self._connection)
+		else:
+			self._connection.close()
+		self._connection = None
+
+class _JSONReader(object):
+	"""Parses one json document from pieces of text. Objects and arrays are walked here, and only their strings, numbers and literals go through json's own decoder, so the text held at once is a piece or a single value, not the document."""
+	def __init__(self, pieces):
+		self._pieces = iter(pieces)
+		self._buffer = ''
+		self._pos = 0
+		self._decoder = json.JSONDecoder()
+
+	def _more(self):
+		# read another piece into the buffer, dropping what has been parsed. False at the end of the text.
+		for piece in self._pieces:
+			self._buffer = self._buffer[self._pos:] + piece
+			self._pos = 0
+			return True
+		return False
+
+	def _peek(self):
+		# the next character that is not whitespace, or '' at the end of the text
+		while True:
+			while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+				self._pos += 1
+			if self._pos < len(self._buffer):
+				return self._buffer[self._pos]
+			if not self._more():
+				return ''
+
+	def _expect(self, characters):
+		c = self._peek()
+		if c == '' or c not in characters:
+			raise ValueError('Expected one of {0!r} in json, found {1!r}'.format(characters, c))
+		self._pos += 1
+		return c
+
+	def document(self):
+		value = self._value()
+		if self._peek() != '':
+			raise ValueError('Extra data after json document')
+		return value
+
+	def _value(self):
+		c = self._peek()
+		if c == '{':
+			self._pos += 1
+			result = {}
+			if self._peek() == '}':
+				self._pos += 1
+				return result
+			while True:
+				if self._peek() != '"':
+					raise ValueError('Expected a json object key')
+				key = self._scalar()
+				self._expect(':')
+				result[key] = self._value()
+				if self._expect(',}') == '}':
+					return result
+		elif c == '[':
+			self._pos += 1
+			result = []
+			if self._peek() == ']':
+				self._pos += 1
+				return result
+			while True:
+				result.append(self._value())
+				if self._expect(',]') == ']':
+					return result
+		elif c == '':
+			raise ValueError('Expected a json value, found the end of the text')
+		return self._scalar()
+
+	def _scalar(self):
+		# a value cut off by the end of the buffer can look complete ("12" of "123", "1" of "1e5"), so read on until something that cannot be part of it follows
+		while True:
+			try:
+				(value, end) = self._decoder.raw_decode(self._buffer, self._pos)
+				if end < len(self._buffer) and self._buffer[end] not in '0123456789.eE+-':
+					self._pos = end
+					return value
+			except ValueError:
+				value = None
+				end = None
+			if not self._more():
+				if end is None:
+					# the text ended in the middle of the value, so raise json's own error
+					self._decoder.raw_decode(self._buffer, self._pos)
+				self._pos = end
+				return value
+
+class HTTPClient(object):
+	"""A small http client that keeps connections open between requests, one pool per host, asks for gzip, and retries failed requests with exponential backoff. Safe to share between threads.
+
+	:ivar timeout: seconds to wait for a connection or a read
+	:vartype timeout: float
+	:ivar retries: the most times a request is tried again after a connection error or a 429 or 5xx response
+	:vartype retries: int
+	:ivar backoff: seconds before the first retry, doubled for each retry after it
+	:vartype backoff: float"""
+	def __init__(self, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF, max_idle=MAX_IDLE):
+		self.timeout = timeout
+		self.retries = retries
+		self.backoff = backoff
+		self.max_idle = max_idle
+		self._idle = {}
+		self._lock = threading.Lock()
+
+	def _connect(self, key):
+		(scheme, host) = key
+		if scheme == 'https':
+			return httplib.HTTPSConnection(host, timeout=self.timeout)
+		return httplib.HTTPConnection(host, timeout=self.timeout)
+
+	def _acquire(self, key):
+		# returns (connection, reused)
+		with self._lock:
+			idle = self._idle.get(key)
+			if idle:
+				return (idle.pop(), True)
+		return (self._connect(key), False)
+
+	def _release(self, key, connection):
+		with self._lock:
+			idle = self._idle.setdefault(key, [])
+			if len(idle) < self.max_idle:
+				idle.append(connection)
+				return
+		connection.close()
+
+	def close(self):
+		"""Close every idle connection."""
+		with self._lock:
+			idle = self._idle
+			self._idle = {}
+		for connections in idle.values():
+			for connection in connections:
+				connection.close()
+
+	def open(self, url, headers=None):
+		"""
+		Send a GET request, following redirects, and start reading the response.
+		:param url: the url
+		:type url: str
+		:param headers: extra request headers
+		:type headers: dict
+		:returns: the response, to be read or closed by the caller
+		:rtype: Response
+		:raises HTTPError: for a response that is not a success, once retries are used up
+		"""
+		for i in range(MAX_REDIRECTS + 1):
+			response = self._open_once(url, headers)
+			if response.status not in REDIRECT_STATUSES:
+				return response
+			location = response._response.getheader('Location')
+			response.read()
+			if not location:
+				raise HTTPError('Redirect from {0} without a location'.format(url), response.status)
+			url = urljoin(url, location)
+		raise HTTPError('Too many redirects from {0}'.format(url))
+
+	def _open_once(self, url, headers):
+		parts = urlsplit(url)
+		key = (parts.scheme or 'http', parts.netloc)
+		path = parts.path or '/'
+		if parts.query:
+			path += '?' + parts.query
+		request_headers = {'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+		request_headers.update(headers or {})
+
+		attempt = 0
+		while True:
+			(connection, reused) = self._acquire(key)
+			try:
+				connection.request('GET', path, headers=request_headers)
+				raw = connection.getresponse()
+			except (socket.error, httplib.HTTPException) as e:
+				connection.close()
+				if reused:
+					# the server closed an idle connection, which says nothing about the request, so try again on a new one for free
+					continue
+				if attempt >= self.retries:
+					if isinstance(e, httplib.HTTPException):
+						raise HTTPError('{0} failed: {1!r}'.format(url, e))
+					raise
+			else:
+				response = Response(self, key, connection, raw)
+				if response.status < 400 or response.status in REDIRECT_STATUSES:
+					return response
+				response.read()
+				if response.status not in RETRY_STATUSES or attempt >= self.retries:
+					raise HTTPError('{0} returned HTTP {1}'.format(url, response.status), response.status)
+			time.sleep(self.backoff * (2 ** attempt))
+			attempt += 1
+
+	def get(self, url, headers=None):
+		"""
+		:returns: the body of a url, decompressed
+		:rtype: bytes
+		"""
+		return self.open(url, headers).read()
+
+	def get_text(self, url, headers=None, encoding='utf-8'):
+		return self.open(url, headers).text(encoding)
+
+	def get_json(self, url, headers=None):
+		return self.open(url, headers).json()
+
+# shared by every request the library makes
+CLIENT = HTTPClient()
 
 def get_html(path):
-	fl = urlopen(path)
 	if sys.version_info.major == 3:
-		text = fl.read().decode('utf-8')
+		return CLIENT.get_text(path)
 	else:
-		text = fl.read()
-	fl.close()
-	return text
+		return CLIENT.get(path)
 
 def get_json(path):
-	text = get_html(path)
-	return json.loads(text)
+	return CLIENT.get_json(path)
 
 def format_money(usd):
 	if usd == None:
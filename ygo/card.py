@@ -1,70 +1,77 @@
 """Holds datatype for yugioh cards"""
 
 class YugiohCard(object):
-	
+	"""A single yugioh card. Fields can be read either as attributes (card.name) or as keys (card['name']).
+
+	The category string is only built the first time it is asked for."""
+
+	__slots__ = ('name', 'text', 'id', 'category_code', 'attribute', 'type',
+		'level', 'attack', 'defense', 'scale', '_category')
+
+	# the fields available through card[key]
+	KEYS = frozenset(['name', 'text', 'id', 'category', 'category_code', 'attribute',
+		'type', 'level', 'attack', 'defense', 'scale'])
+
 	def __init__(self, name, text, cid, category, attribute, race, attack, defense, level, lscale, rscale):
-		self.properties = {
-			"uname": name,
-			"utext": text,
-			"category_code": category,
-			"category": CATEGORY(category),
-			"id": cid,
-			"attribute": attribute,
-			"type": race,
-			"level": level,
-			"attack": attack,
-			"defense": defense,
-			"scale": lscale
-		}
+		self.name = name
+		self.text = text
+		self.category_code = category
+		self._category = None
+		self.id = cid
+		self.attribute = attribute
+		self.type = race
+		self.level = level
+		self.attack = attack
+		self.defense = defense
+		self.scale = lscale
+
+	@property
+	def category(self):
+		if self._category is None:
+			self._category = CATEGORY(self.category_code)
+		return self._category
+
+	@property
+	def properties(self):
+		"""A dict snapshot of every field of the card."""
+		return dict((key, getattr(self, key)) for key in self.KEYS)
 
 	def clone(self, other):
 		assert(isinstance(other, YugiohCard))
-		self.properties = {
-			"uname": other['name'],
-			"utext": other['text'],
-			"category": other['category'],
-			"id": other['id'],
-			"attribute": other['attribute'],
-			"type": other['type'],
-			"level": other['level'],
-			"attack": other['attack'],
-			"defense": other['defense'],
-			"scale": other['scale']
-		}
+		self.name = other.name
+		self.text = other.text
+		self.category_code = other.category_code
+		self._category = other._category
+		self.id = other.id
+		self.attribute = other.attribute
+		self.type = other.type
+		self.level = other.level
+		self.attack = other.attack
+		self.defense = other.defense
+		self.scale = other.scale
 
 	def __iter__(self):
 		raise TypeError("'{}' object is not iterable".format(self.__class__.__name__))
 
 	def __getitem__(self, key):
-		if key == 'name':
-			return self.properties['uname']
-		elif key == 'text':
-			return self.properties['utext']
-		elif key in self.properties:
-			return self.properties[key]
+		if key in self.KEYS:
+			return getattr(self, key)
 		else:
 			raise KeyError(key)
 
-	def __getattr__(self, key):
-		if key == 'name':
-			return self.properties['uname']
-		elif key == 'text':
-			return self.properties['utext']
-		elif key in self.properties:
-			return self.properties[key]
-		else:
-			raise AttributeError("'{0}' object has no attribute '{1}'".format(self.__class__.__name__, key))
-
 	def __hash__(self):
-		return hash(self['id'])
+		return hash(self.id)
 
 	def __eq__(self, other):
-		return isinstance(other, YugiohCard) and self['id'] == other['id']
+		return isinstance(other, YugiohCard) and self.id == other.id
+
+	def __ne__(self, other):
+		return not self == other
 		
 	def __lt__(self, other):
-		return self['id'] < other['id']
+		return self.id < other.id
 	def __gt__(self, other):
-		return self['id'] > other['id']
+		return self.id > other.id
 		
 	def __repr__(self):
 		return 'YugiohCard({0})'.format(str(self))
@@ -73,70 +80,70 @@ class YugiohCard(object):
 
 		
 	def is_monster(self):
-		return (self['category_code'] & 1) > 0
+		return (self.category_code & 1) > 0
 
 	def is_spell(self):
-		return (self['category_code'] & 2) > 0
+		return (self.category_code & 2) > 0
 
 	def is_trap(self):
-		return (self['category_code'] & 4) > 0
+		return (self.category_code & 4) > 0
 
 	#def is_tuner(self):
-	#	return (self['category_code'] & 8) > 0
+	#	return (self.category_code & 8) > 0
 
 	def is_normal_monster(self):
-		return (self['category_code'] & 16) > 0
+		return (self.category_code & 16) > 0
 
 	def is_effect_monster(self):
-		return (self['category_code'] & 32) > 0
+		return (self.category_code & 32) > 0
 
 	def is_fusion(self):
-		return (self['category_code'] & 64) > 0
+		return (self.category_code & 64) > 0
 
 	def is_ritual(self):
-		return (self['category_code'] & 128) > 0
+		return (self.category_code & 128) > 0
 
 	def is_spirit(self):
-		return (self['category_code'] & 512) > 0
+		return (self.category_code & 512) > 0
 
 	def is_union(self):
-		return (self['category_code'] & 1024) > 0
+		return (self.category_code & 1024) > 0
 
 	def is_gemini(self):
-		return (self['category_code'] & 2048) > 0
+		return (self.category_code & 2048) > 0
 
 	def is_tuner(self):
-		return (self['category_code'] & 4096) > 0
+		return (self.category_code & 4096) > 0
 
 	def is_synchro(self):
-		return (self['category_code'] & 8192) > 0
+		return (self.category_code & 8192) > 0
 
 	def is_quickplay(self):
-		return (self['category_code'] & 65536) > 0
+		return (self.category_code & 65536) > 0
 
 	def is_continuous(self):
-		return (self['category_code'] & 131072) > 0
+		return (self.category_code & 131072) > 0
 
 	def is_equip(self):
-		return (self['category_code'] & 262144) > 0
+		return (self.category_code & 262144) > 0
 
 	def is_field(self):
-		return (self['category_code'] & 524288) > 0
+		return (self.category_code & 524288) > 0
 
 	def is_counter_trap(self):
-		return (self['category_code'] & 1048576) > 0
+		return (self.category_code & 1048576) > 0
 
 	def is_flip_effect(self):
-		return (self['category_code'] & 2097152) > 0
+		return (self.category_code & 2097152) > 0
 
 	def is_toon(self):
-		return (self['category_code'] & 4194304) > 0
+		return (self.category_code & 4194304) > 0
 
 	def is_xyz(self):
-		return (self['category_code'] & 8388608) > 0
+		return (self.category_code & 8388608) > 0
 
 	def is_pendulum(self):
-		return (self['category_code'] & 16777216) > 0
+		return (self.category_code & 16777216) > 0
 		
 	def in_extra_deck(self):
 		return self.is_xyz() or self.is_fusion() or self.is_synchro()
@@ -144,7 +151,33 @@ class YugiohCard(object):
 		return not self.in_extra_deck()
 
 	def sort_key(self):
-		return (self['category_code'], self['level'], self['attack'], self['defense'], self['id'])
+		return (self.category_code, self.level, self.attack, self.defense, self.id)
+
+# the bit of category_code that marks each card trait, by its yql name
+CATEGORY_BITS = {
+	'monster': 1 << 0,
+	'spell': 1 << 1,
+	'trap': 1 << 2,
+	'normal': 1 << 4,
+	'effect': 1 << 5,
+	'fusion': 1 << 6,
+	'ritual': 1 << 7,
+	'spirit': 1 << 9,
+	'union': 1 << 10,
+	'gemini': 1 << 11,
+	'tuner': 1 << 12,
+	'synchro': 1 << 13,
+	'token': 1 << 14,
+	'quick-play': 1 << 16,
+	'continuous': 1 << 17,
+	'equip': 1 << 18,
+	'field': 1 << 19,
+	'counter': 1 << 20,
+	'flip': 1 << 21,
+	'toon': 1 << 22,
+	'xyz': 1 << 23,
+	'pendulum': 1 << 24,
+}
 
 def CATEGORY(number):
 	output = []
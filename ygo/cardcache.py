@@ -0,0 +1,42 @@
+"""
+A snapshot of fully decoded cards on disk, so that a new process can fill its card catalog with a single file read instead of rebuilding every card from cards.cdb.
+
+The snapshot is tagged with the fingerprint of the database it was made from (see ygopro.database_fingerprint), and is ignored as soon as the database changes.
+"""
+import pickle
+
+CACHE_VERSION = 1
+
+def load(path, fingerprint):
+	"""
+	Read the cards saved in a cache file.
+	:param path: the cache file
+	:type path: str
+	:param fingerprint: the fingerprint of the current database
+	:type fingerprint: tuple
+	:returns: the cards, or None if the cache is missing, unreadable, or made from a different database
+	:rtype: list of YugiohCard or None
+	"""
+	try:
+		with open(path, 'rb') as fl:
+			data = fl.read()
+		version, saved_fingerprint, cards = pickle.loads(data)
+	except (IOError, OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+		return None
+	if version != CACHE_VERSION or saved_fingerprint != fingerprint:
+		return None
+	return cards
+
+def save(path, fingerprint, cards):
+	"""
+	Write cards to a cache file.
+	:param path: the cache file
+	:type path: str
+	:param fingerprint: the fingerprint of the database the cards came from
+	:type fingerprint: tuple
+	:param cards: the cards
+	:type cards: list of YugiohCard
+	"""
+	data = pickle.dumps((CACHE_VERSION, fingerprint, list(cards)), pickle.HIGHEST_PROTOCOL)
+	with open(path, 'wb') as fl:
+		fl.write(data)
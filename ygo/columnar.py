@@ -0,0 +1,254 @@
+"""
+A column oriented snapshot of a set of cards, and a yql backend that evaluates a compiled query against every card at once with numpy, instead of walking the query tree once per card.
+
+Example: ::
+
+	table = CardTable(session.all_cards())
+	dragons = table.filter('monster and attack > 2000 and type Dragon')
+
+Numeric fields are int64 arrays with a matching mask of which cards have a value (spells have no level, for instance). Type and attribute are stored as small integer codes into a list of their distinct strings, so a match against them only runs the regex once per distinct value. Anything the backend does not have a vectorized form for is evaluated card by card with the ordinary yql semantics.
+"""
+import re
+
+NUMPY_EXISTS = True
+try:
+	import numpy
+except ImportError:
+	NUMPY_EXISTS = False
+
+from . import yql
+from .card import CATEGORY
+
+# stored as int64 arrays, with a mask of which cards have a value
+NUMERIC_KEYS = ['level', 'attack', 'defense', 'scale']
+
+# stored as integer codes into a list of the distinct values
+CODED_KEYS = ['type', 'attribute']
+
+# kept as plain lists of python strings
+TEXT_KEYS = ['name', 'text']
+
+class _Numbers(object):
+	def __init__(self, values, present):
+		self.values = values
+		self.present = present
+
+class _Coded(object):
+	def __init__(self, codes, strings):
+		self.codes = codes
+		self.strings = strings
+
+class _Objects(object):
+	def __init__(self, values):
+		self.values = values
+
+def _match_value(value, pattern):
+	# the same semantics as yql.Match
+	if isinstance(value, str) and isinstance(pattern, str):
+		return yql.compile_pattern(pattern)(value)
+	try:
+		return 0 if re.search(pattern, value) is None else 1
+	except TypeError:
+		return value == pattern
+
+def _ordered(compare):
+	# the same semantics as yql.LessThan and yql.GreaterThan
+	def run(a, b):
+		try:
+			return compare(a, b)
+		except TypeError:
+			return False
+	return run
+
+_PYTHON_OPS = {
+	yql.Equal: lambda a, b: a == b,
+	yql.LessThan: _ordered(lambda a, b: a < b),
+	yql.GreaterThan: _ordered(lambda a, b: a > b),
+	yql.Match: _match_value,
+}
+
+class CardTable(object):
+	"""A set of cards stored column by column.
+
+	:ivar cards: the cards, in the same order as every column
+	:vartype cards: list of YugiohCard
+	:ivar id: card ids
+	:vartype id: numpy.ndarray of int64
+	:ivar category: category bitmasks
+	:vartype category: numpy.ndarray of int64"""
+	def __init__(self, cards):
+		if not NUMPY_EXISTS:
+			raise ImportError("No module named 'numpy'")
+		self.cards = list(cards)
+		self.id = numpy.array([int(card.id) for card in self.cards], dtype=numpy.int64)
+		self.category = numpy.array([card.category_code for card in self.cards], dtype=numpy.int64)
+
+		self.numbers = {}
+		self.present = {}
+		for key in NUMERIC_KEYS:
+			raw = [card[key] for card in self.cards]
+			self.present[key] = numpy.array([x is not None for x in raw], dtype=bool)
+			self.numbers[key] = numpy.array([0 if x is None else x for x in raw], dtype=numpy.int64)
+
+		self.codes = {}
+		self.strings = {}
+		for key in CODED_KEYS:
+			strings = []
+			lookup = {}
+			codes = []
+			for card in self.cards:
+				value = card[key]
+				if value not in lookup:
+					lookup[value] = len(strings)
+					strings.append(value)
+				codes.append(lookup[value])
+			self.codes[key] = numpy.array(codes, dtype=numpy.int64)
+			self.strings[key] = strings
+
+		self.text = {}
+		for key in TEXT_KEYS:
+			self.text[key] = [card[key] for card in self.cards]
+
+	def __len__(self):
+		return len(self.cards)
+
+	def mask(self, expr):
+		"""
+		:param expr: the query to evaluate
+		:type expr: str or yql.YQuery
+		:returns: a boolean array, true for every card matching the query
+		:rtype: numpy.ndarray of bool
+		"""
+		return self._truth(self._evaluate(yql.compile_yql(expr)))
+
+	def filter(self, expr):
+		"""
+		:param expr: the query to evaluate
+		:type expr: str or yql.YQuery
+		:returns: every card matching the query, in table order
+		:rtype: list of YugiohCard
+		"""
+		return [self.cards[i] for i in numpy.flatnonzero(self.mask(expr))]
+
+	def _column(self, key):
+		if key in self.numbers:
+			return _Numbers(self.numbers[key], self.present[key])
+		elif key in self.codes:
+			return _Coded(self.codes[key], self.strings[key])
+		elif key in self.text:
+			return _Objects(self.text[key])
+		elif key == 'category':
+			codes, inverse = numpy.unique(self.category, return_inverse=True)
+			return _Coded(inverse.reshape(-1), [CATEGORY(int(code)) for code in codes])
+		else:
+			# not a column, so let the card raise whatever it raises
+			return _Objects([card[key] for card in self.cards])
+
+	def _evaluate(self, node):
+		if isinstance(node, (yql.Integer, yql.String)):
+			return node.value
+		elif isinstance(node, yql.KeyVariable):
+			return self._column(node.value)
+		elif isinstance(node, yql.CategoryVariable):
+			if node.bit is not None:
+				return (self.category & node.bit) != 0
+			name = node.value.capitalize()
+			category = self._column('category')
+			return self._coded_mask(category, lambda string: name in string)
+		elif isinstance(node, yql.And):
+			return self._truth(self._evaluate(node.a)) & self._truth(self._evaluate(node.b))
+		elif isinstance(node, yql.Or):
+			return self._truth(self._evaluate(node.a)) | self._truth(self._evaluate(node.b))
+		elif type(node) in _PYTHON_OPS:
+			return self._compare(type(node), self._evaluate(node.a), self._evaluate(node.b))
+		else:
+			return _Objects([node(card) for card in self.cards])
+
+	def _compare(self, op, a, b):
+		if isinstance(b, _Numbers) and not isinstance(a, (_Numbers, _Coded, _Objects, numpy.ndarray)):
+			# put the column on the left hand side
+			if op is yql.LessThan:
+				return self._compare(yql.GreaterThan, b, a)
+			elif op is yql.GreaterThan:
+				return self._compare(yql.LessThan, b, a)
+			elif op is yql.Equal:
+				return self._compare(yql.Equal, b, a)
+
+		if isinstance(a, _Numbers) and isinstance(b, int):
+			# cards without a value never pass a numeric comparison
+			if op is yql.Equal or op is yql.Match:
+				return a.present & (a.values == b)
+			elif op is yql.LessThan:
+				return a.present & (a.values < b)
+			else:
+				return a.present & (a.values > b)
+		elif isinstance(a, _Numbers) and isinstance(b, str):
+			# a number never equals or matches a string
+			if op is yql.Equal or op is yql.Match:
+				return numpy.zeros(len(self), dtype=bool)
+		elif isinstance(a, _Numbers) and isinstance(b, _Numbers):
+			both = a.present & b.present
+			if op is yql.Equal or op is yql.Match:
+				return (both & (a.values == b.values)) | ~(a.present | b.present)
+			elif op is yql.LessThan:
+				return both & (a.values < b.values)
+			else:
+				return both & (a.values > b.values)
+		elif isinstance(a, numpy.ndarray) and isinstance(b, int):
+			if op is yql.Equal or op is yql.Match:
+				return a == b
+			elif op is yql.LessThan:
+				return a < b
+			else:
+				return a > b
+		elif isinstance(a, _Coded) and isinstance(b, str):
+			if op is yql.Equal:
+				return self._coded_mask(a, lambda string: string == b)
+			elif op is yql.Match:
+				return self._coded_mask(a, lambda string: _match_value(string, b))
+		elif isinstance(a, _Objects) and isinstance(b, str) and op is yql.Match:
+			search = yql.compile_pattern(b)
+			return numpy.array([
+				search(value) if isinstance(value, str) else value == b
+				for value in a.values], dtype=bool)
+
+		# no vectorized form, compare card by card
+		python_op = _PYTHON_OPS[op]
+		left = self._values(a)
+		right = self._values(b)
+		if not isinstance(left, list) and not isinstance(right, list):
+			return python_op(left, right)
+		if not isinstance(left, list):
+			left = [left] * len(self)
+		if not isinstance(right, list):
+			right = [right] * len(self)
+		return _Objects([python_op(x, y) for (x, y) in zip(left, right)])
+
+	def _coded_mask(self, coded, test):
+		selected = [code for (code, string) in enumerate(coded.strings) if test(string)]
+		return numpy.isin(coded.codes, selected)
+
+	def _values(self, value):
+		# the per-card python values of an evaluated node
+		if isinstance(value, _Numbers):
+			return [int(x) if p else None for (x, p) in zip(value.values, value.present)]
+		elif isinstance(value, _Coded):
+			return [value.strings[code] for code in value.codes]
+		elif isinstance(value, _Objects):
+			return value.values
+		elif isinstance(value, numpy.ndarray):
+			return [bool(x) for x in value]
+		else:
+			return value
+
+	def _truth(self, value):
+		if isinstance(value, numpy.ndarray):
+			return value
+		elif isinstance(value, _Numbers):
+			return value.present & (value.values != 0)
+		elif isinstance(value, _Coded):
+			return self._coded_mask(value, bool)
+		elif isinstance(value, _Objects):
+			return numpy.array([bool(x) for x in value.values], dtype=bool)
+		else:
+			return numpy.full(len(self), bool(value), dtype=bool)
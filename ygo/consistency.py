@@ -1,6 +1,11 @@
+import math
 import itertools
+import collections
+from fractions import Fraction
+import multiprocessing
 from . import deck
 from . import yql
+from .card import YugiohCard
 
 """
 Still under development. If you want to dig into the source, be my guest.
@@ -8,6 +13,19 @@ Still under development. If you want to dig into the source, be my guest.
 
 VERBOSE = 0
 
+# decks are at most 60 cards, so every binomial coefficient a deck needs is in the table from the start
+MAX_DECK_SIZE = 60
+
+# pascal's triangle, BINOMIAL[n][k] is n choose k
+BINOMIAL = [[1]]
+
+def _extend_binomial(n):
+	while len(BINOMIAL) <= n:
+		previous = BINOMIAL[-1]
+		BINOMIAL.append([1] + [previous[i] + previous[i + 1] for i in range(len(previous) - 1)] + [1])
+
+_extend_binomial(MAX_DECK_SIZE)
+
 def choose(n, k):
 	# classic combinatorics function.
 	# see https://en.wikipedia.org/wiki/Combination
@@ -15,18 +33,18 @@ def choose(n, k):
 	# Use this over itertools.combinations
 	# we just want the number of combinations
 	# itertools would actually generate the combinations
-	if n == k:
-		return 1.0
-	elif k == 0:
-		return 1.0
-	elif n == 0:
-		return 0.0
-	num = 1
-	den = 1
-	for i in range(0, k):
-		num *= (n - i)
-		den *= (k - i)
-	return num / float(den)
+	if k < 0 or k > n:
+		return 0
+	if n >= len(BINOMIAL):
+		_extend_binomial(n)
+	return BINOMIAL[n][k]
+
+def log_choose(n, k):
+	# the natural log of choose(n, k), for multiplying many of them together without overflowing a float
+	value = choose(n, k)
+	if value == 0:
+		return float('-inf')
+	return math.log(value)
 
 def available_copies(var, deck):
 	total = 0
@@ -34,92 +52,6 @@ def available_copies(var, deck):
 		total += deck.count(card)
 	return total
 
-def union_all(ls):
-	total = set()
-	for st in ls:
-		total.update(st)
-	return total
-	
-def make_term(v, c):
-	return (frozenset(v), c)
-
-class Hand(object):
-	def __init__(self, terms=None):
-		self.terms = list(terms) or []
-	def with_term(self, term):
-		new_terms = self.terms + [term]
-		return Hand(new_terms)
-	def size(self):
-		return sum(x[1] for x in self.terms) if len(self.terms) > 0 else 0
-	def count(self, cset):
-		total = 0
-		for (var, count) in self.terms:
-			if var.issubset(cset):
-				total += count
-		return total
-	def __str__(self):
-		terms = []
-		for (v, c) in self.terms:
-			if len(v) > 3:
-				vtext = '{' + ', '.join(str(x) for x in list(v)[:3]+['...']) + '}'
-			else:
-				vtext = '{' + ', '.join(str(x) for x in v) + '}'
-			ctext = str(c)
-			text = vtext+'='+ctext
-			terms.append(text)
-		return 'Hand[' + '; '.join(terms) + ']'
-
-	def combinations(self, deck):
-		hand_size = self.size()
-		total = 1.0
-		for (var, varcount) in self.terms:
-			copies = available_copies(var, deck)
-			var_combinations = choose(copies, varcount)
-			total *= var_combinations
-		return total
-
-def generate_hands(variables, deck, max_hand_size=5):
-	# all variables must be disjoint sets of cards
-	variable_iter = iter(variables)
-	all_hands = []
-
-	var = next(variable_iter)
-	max_copies = min(available_copies(var, deck), max_hand_size)
-	for varcount in range(1, max_copies+1):
-		term = (frozenset(var), varcount)
-		hand = Hand([term])
-		all_hands.append(hand)
-
-	for var in variable_iter:
-		hand_buffer = []
-		for existing_hand in all_hands:
-			remaining_hand_capacity = max_hand_size - existing_hand.size()
-			var_copies = available_copies(var, deck)
-			max_copies = min(var_copies, remaining_hand_capacity)
-			for varcount in range(1, max_copies+1):
-				new_term = (frozenset(var), varcount)
-				new_hand = existing_hand.with_term(new_term)
-				hand_buffer.append(new_hand)
-		all_hands = hand_buffer
-
-	# fill out the incomplete hands
-	hand_buffer = []
-	all_variables = union_all(variables)
-	restvar = set(deck).difference(all_variables)
-	rest_copies = available_copies(restvar, deck)
-	for existing_hand in all_hands:
-		remaining_capacity = max_hand_size - existing_hand.size()
-		if remaining_capacity > rest_copies:
-			continue
-		elif remaining_capacity == 0:
-			hand_buffer.append(existing_hand)
-		else:
-			new_term = (frozenset(restvar), remaining_capacity)
-			new_hand = existing_hand.with_term(new_term)
-			hand_buffer.append(new_hand)
-
-	return hand_buffer
-
 def conjunction(exprs):
 	a = exprs.pop()
 	b = exprs.pop()
@@ -197,11 +129,26 @@ class AST(object):
 		# returns the number of copies that match the expression
 		return 0
 
+	def cardsets(self):
+		# every card set the expression counts, as frozensets of cards
+		return iter(())
+
+	def evaluate(self, counts, hand_size):
+		# the value of the expression for many hands at once.
+		# counts maps every card set to an array of how many of its cards each hand holds.
+		raise NotImplementedError('{} cannot be evaluated on counts'.format(self.__class__.__name__))
+
+	def lower(self, program):
+		# write the statements computing the least and greatest value the expression can take in a partly drawn hand into a Program.
+		# the Program's card set names hold the least and greatest number of each card set's cards the hand can end up with.
+		# returns the names holding the least and greatest value.
+		raise NotImplementedError('{} cannot be lowered'.format(self.__class__.__name__))
+
 class Cardset(AST):
 	'''a set of cards. The fundamental variable of expressions.'''
 	def __init__(self, cards_iterable):
 		cards = [card for card in cards_iterable]
-		assert(all(isinstance(x, deck.Card) for x in cards))
+		assert(all(isinstance(x, YugiohCard) for x in cards))
 		self.contents = frozenset(cards)
 
 	def __len__(self):
@@ -235,7 +182,7 @@ class Cardset(AST):
 		if isinstance(other, Cardset):
 			return Cardset(self.contents.intersection(other.contents))
 		elif isinstance(other, yql.YQuery) or isinstance(other, str):
-			result = yql.filter(self.contents, other)
+			result = yql.compile_yql(other).filter(self.contents)
 			return Cardset(list(result))
 		else:
 			raise RuntimeError('Cannot constrain cardset {} by filter {}'.format(self, other))
@@ -243,6 +190,19 @@ class Cardset(AST):
 	def variables(self, deck):
 		yield self.contents
 
+	def cardsets(self):
+		yield self.contents
+
+	def evaluate(self, counts, hand_size):
+		if len(self.contents) == 0:
+			return 0
+		return counts[self.contents]
+
+	def lower(self, program):
+		if len(self.contents) == 0:
+			return ('0', '0')
+		return program.cardset(self.contents)
+
 	def pre_evaluate(self):
 		if len(self) == 0:
 			return 0
@@ -263,6 +223,8 @@ class Constraint(AST):
 		self.op2 = b
 	def __iter__(self):
 		return iter([self.op1, self.op2])
+	def cardsets(self):
+		return itertools.chain(self.op1.cardsets(), self.op2.cardsets())
 	def variables(self, deck):
 		final_variables = []
 
@@ -305,7 +267,7 @@ class Constraint(AST):
 			# new variable and existing variable can be split into three new variables
 			elif len(new_variable.intersection(existing)) > 0:
 				intersection = new_variable.intersection(existing)
-				resulting_variable.append(intersection)
+				resulting_variables.append(intersection)
 				resulting_variables.append(existing.difference(intersection))
 				new_variable = new_variable.difference(intersection)
 
@@ -325,6 +287,10 @@ class Number(AST):
 		return str(self._value)
 	def __call__(self, hand):
 		return self._value
+	def evaluate(self, counts, hand_size):
+		return self._value
+	def lower(self, program):
+		return (str(self._value), str(self._value))
 	def pre_evaluate(self):
 		return self._value
 
@@ -335,6 +301,10 @@ class HandSize(AST):
 		return '$H'
 	def __call__(self, hand):
 		return hand.size()
+	def evaluate(self, counts, hand_size):
+		return hand_size
+	def lower(self, program):
+		return ('H', 'H')
 	def pre_evaluate(self):
 		return None
 
@@ -343,6 +313,12 @@ class GreaterThan(Constraint):
 		return '({})'.format(' > '.join(str(x) for x in self))
 	def __call__(self, hand):
 		return self.op1(hand) > self.op2(hand)
+	def evaluate(self, counts, hand_size):
+		return self.op1.evaluate(counts, hand_size) > self.op2.evaluate(counts, hand_size)
+	def lower(self, program):
+		(a0, a1) = self.op1.lower(program)
+		(b0, b1) = self.op2.lower(program)
+		return program.assign('{a0} > {b1}', '{a1} > {b0}', a0=a0, a1=a1, b0=b0, b1=b1)
 	def pre_evaluate(self):
 		left = self.op1.pre_evaluate()
 		right = self.op2.pre_evaluate()
@@ -363,6 +339,12 @@ class LessThan(Constraint):
 		return '({})'.format(' < '.join(str(x) for x in self))
 	def __call__(self, hand):
 		return self.op1(hand) < self.op2(hand)
+	def evaluate(self, counts, hand_size):
+		return self.op1.evaluate(counts, hand_size) < self.op2.evaluate(counts, hand_size)
+	def lower(self, program):
+		(a0, a1) = self.op1.lower(program)
+		(b0, b1) = self.op2.lower(program)
+		return program.assign('{a1} < {b0}', '{a0} < {b1}', a0=a0, a1=a1, b0=b0, b1=b1)
 	def pre_evaluate(self):
 		left = self.op1.pre_evaluate()
 		right = self.op2.pre_evaluate()
@@ -383,6 +365,12 @@ class Equal(Constraint):
 		return '({})'.format(' = '.join(str(x) for x in self))
 	def __call__(self, hand):
 		return self.op1(hand) == self.op2(hand)
+	def evaluate(self, counts, hand_size):
+		return self.op1.evaluate(counts, hand_size) == self.op2.evaluate(counts, hand_size)
+	def lower(self, program):
+		(a0, a1) = self.op1.lower(program)
+		(b0, b1) = self.op2.lower(program)
+		return program.assign('{a0} == {a1} == {b0} == {b1}', '{a0} <= {b1} and {b0} <= {a1}', a0=a0, a1=a1, b0=b0, b1=b1)
 	def pre_evaluate(self):
 		left = self.op1.pre_evaluate()
 		right = self.op2.pre_evaluate()
@@ -403,6 +391,12 @@ class And(Constraint):
 		return '({})'.format(' && '.join(str(x) for x in self))
 	def __call__(self, hand):
 		return self.op1(hand) != 0 and self.op2(hand) != 0
+	def evaluate(self, counts, hand_size):
+		return (self.op1.evaluate(counts, hand_size) != 0) & (self.op2.evaluate(counts, hand_size) != 0)
+	def lower(self, program):
+		(a0, a1) = self.op1.lower(program)
+		(b0, b1) = self.op2.lower(program)
+		return program.assign('{a0} > 0 and {b0} > 0', '{a1} > 0 and {b1} > 0', a0=a0, a1=a1, b0=b0, b1=b1)
 	def pre_evaluate(self):
 		left = self.op1.pre_evaluate()
 		right = self.op2.pre_evaluate()
@@ -431,6 +425,12 @@ class Or(Constraint):
 		return '({})'.format(' || '.join(str(x) for x in self))
 	def __call__(self, hand):
 		return self.op1(hand) != 0 or self.op2(hand) != 0
+	def evaluate(self, counts, hand_size):
+		return (self.op1.evaluate(counts, hand_size) != 0) | (self.op2.evaluate(counts, hand_size) != 0)
+	def lower(self, program):
+		(a0, a1) = self.op1.lower(program)
+		(b0, b1) = self.op2.lower(program)
+		return program.assign('{a0} > 0 or {b0} > 0', '{a1} > 0 or {b1} > 0', a0=a0, a1=a1, b0=b0, b1=b1)
 	def pre_evaluate(self):
 		left = self.op1.pre_evaluate()
 		right = self.op2.pre_evaluate()
@@ -464,8 +464,15 @@ class Not(AST):
 		return 'not {}'.format(str(self._subexpr))
 	def variables(self, deck):
 		return self._subexpr.variables(deck)
+	def cardsets(self):
+		return self._subexpr.cardsets()
 	def __call__(self, hand):
 		return self._subexpr(hand) == 0
+	def evaluate(self, counts, hand_size):
+		return self._subexpr.evaluate(counts, hand_size) == 0
+	def lower(self, program):
+		(v0, v1) = self._subexpr.lower(program)
+		return program.assign('{v1} == 0', '{v0} == 0', v0=v0, v1=v1)
 
 	def pre_evaluate(self):
 		value = self._subexpr.pre_evaluate()
@@ -485,13 +492,408 @@ class Not(AST):
 		else:
 			return Not(self._subexpr.simplify())
 
-def probability(deck, expr, hand_size=5):
-	variables = expr.variables(deck)
-	successes = 0
-	hands = generate_hands(variables, deck, hand_size)
-	for hand in hands:
-		if expr(hand):
-			successes += hand.combinations(deck)
-
-	total_possible_hands = choose(len(deck), hand_size)
-	return float(successes) / total_possible_hands
+class Program(object):
+	"""The python source of a function that works out the bounds of an expression, written by AST.lower.
+
+	Card set j is read from the names l<j> and h<j>, the hand size from H, and every node of the expression assigns its bounds to two new names, so the finished function is one flat run of integer comparisons. Comparisons leave booleans rather than 0 and 1, which compare the same. The function's first lines, which fill in the card sets, are up to whoever compiles it."""
+	def __init__(self, cardsets):
+		self.cardsets = list(cardsets)
+		self.index = dict((cardset, j) for (j, cardset) in enumerate(self.cardsets))
+		self.lines = []
+
+	def cardset(self, contents):
+		j = self.index[contents]
+		return ('l{}'.format(j), 'h{}'.format(j))
+
+	def assign(self, low, high, **names):
+		n = len(self.lines)
+		self.lines.append('t{0}l = {1}; t{0}h = {2}'.format(n, low.format(**names), high.format(**names)))
+		return ('t{}l'.format(n), 't{}h'.format(n))
+
+	def function(self, name, arguments, preamble, result, namespace=None):
+		"""
+		Compile the program into a function.
+		:param name: the function's name
+		:param arguments: the function's arguments, as source
+		:param preamble: lines of source that set l<j>, h<j> and H
+		:param result: the source of the return value, with {low} and {high} standing for the expression's bounds
+		:param namespace: globals the function can use
+		:rtype: function
+		"""
+		source = ['def {}({}):'.format(name, arguments)]
+		for line in preamble + self.lines:
+			source.append('\t' + line)
+		source.append('\treturn ' + result)
+		namespace = dict(namespace or {})
+		exec(compile('\n'.join(source) + '\n', '<consistency {}>'.format(name), 'exec'), namespace)
+		return namespace[name]
+
+def _lower(expr, cardsets):
+	program = Program(cardsets)
+	(low, high) = expr.lower(program)
+	return (program, low, high)
+
+def _compile_decide(expr, cardsets):
+	# the bounds of an expression over a partly drawn hand: counts holds the cards drawn from each card set so far,
+	# and room how many more each card set has left in the deck, of which at most slots more can be drawn
+	(program, low, high) = _lower(expr, cardsets)
+	preamble = ['l{0} = counts[{0}]; h{0} = l{0} + (slots if slots < room[{0}] else room[{0}])'.format(j) for j in range(len(program.cardsets))]
+	return program.function('decide', 'counts, room, slots, H', preamble, '({}, {})'.format(low, high))
+
+def _distinct_cardsets(expr):
+	cardsets = []
+	for cardset in expr.cardsets():
+		if len(cardset) > 0 and cardset not in cardsets:
+			cardsets.append(cardset)
+	return cardsets
+
+# stands for the cards outside every variable, where a variable index is expected
+REST = -1
+
+class HandSpace(object):
+	"""The opening hands of a deck, as far as one expression can tell them apart.
+
+	The deck is split into the disjoint variables of the expression plus the rest of the deck, and a hand is just a number of copies drawn from each. The hands are counted variable by variable. As soon as the expression's bounds show that every way of finishing a partial hand passes (or fails), the whole branch is counted at once (or dropped), and branches that reach the same state are only counted once."""
+	def __init__(self, expr, deck, variables=None):
+		# variables only depend on the expression, so they can be worked out once and passed in for many decks
+		if variables is None:
+			variables = expr_variables(expr)
+		self.expr = expr
+		self.variables = variables
+		self.copies = [available_copies(v, deck) for v in self.variables]
+		self.deck_size = len(deck)
+		self.rest = self.deck_size - sum(self.copies)
+
+		self.cardsets = _distinct_cardsets(expr)
+		# which variables make up each card set
+		self.members = []
+		for cardset in self.cardsets:
+			members = []
+			for (i, var) in enumerate(self.variables):
+				if var.issubset(cardset):
+					members.append(i)
+				elif not var.isdisjoint(cardset):
+					raise RuntimeError('Variable {} is not a partition of {}'.format(var, cardset))
+			self.members.append(members)
+		self._decide = _compile_decide(expr, self.cardsets)
+
+	def _counter(self, hand_size, first=None):
+		# the dimensions of the count, as (copies, card sets it adds to), with the rest of the deck as a dimension that adds to none,
+		# and the memoized count of ways to fill slots more cards from dimension i onwards, given counts cards drawn into each card set.
+		# first (a variable, or REST) goes in front, and is kept even with no copies.
+		dims = [i for i in range(len(self.variables)) if self.copies[i] > 0 and i != first]
+		if self.rest > 0 and first != REST:
+			dims.append(REST)
+		if first is not None:
+			dims.insert(0, first)
+		copies = [self.rest if d == REST else self.copies[d] for d in dims]
+		adds_to = [[] if d == REST else [j for (j, members) in enumerate(self.members) if d in members] for d in dims]
+		parts = len(dims)
+		# copies of every card left in the deck from dimension i onwards
+		pool = [sum(copies[i:]) for i in range(parts + 1)]
+		# copies from dimension i onwards that belong to each card set
+		remaining = []
+		for i in range(parts + 1):
+			remaining.append([sum(copies[k] for k in range(i, parts) if j in adds_to[k]) for j in range(len(self.cardsets))])
+		# every coefficient the count needs is a row of the binomial table, looked up directly in the loop below
+		_extend_binomial(max(copies + [0]))
+		ways = [BINOMIAL[c] for c in copies]
+
+		decide = self._decide
+		memo = {}
+		def count(i, slots, counts):
+			key = (i, slots, counts)
+			if key in memo:
+				return memo[key]
+			lo, hi = decide(counts, remaining[i], slots, hand_size)
+			if lo > 0:
+				result = choose(pool[i], slots)
+			elif hi == 0:
+				result = 0
+			elif i == parts:
+				raise RuntimeError('Could not decide {} for a complete hand'.format(self.expr))
+			else:
+				result = 0
+				for k in range(0, min(copies[i], slots) + 1):
+					drawn = list(counts)
+					for j in adds_to[i]:
+						drawn[j] += k
+					result += ways[i][k] * count(i + 1, slots - k, tuple(drawn))
+			memo[key] = result
+			return result
+		return (count, adds_to)
+
+	def successes(self, hand_size=5):
+		"""
+		:returns: the number of distinct hands of hand_size cards that satisfy the expression
+		"""
+		(count, adds_to) = self._counter(hand_size)
+		return count(0, hand_size, (0,) * len(self.cardsets))
+
+	def completions(self, variable, hand_size=5):
+		"""
+		Count the satisfying hands around one variable, so that a change to its number of copies only takes a weighted sum to account for.
+		:param variable: the index of a variable, or REST for the cards outside every variable
+		:param hand_size: the number of cards drawn
+		:returns: for every k up to hand_size, the number of ways to draw the other hand_size - k cards from everything but the variable such that a hand with k copies from the variable satisfies the expression. It does not depend on the variable's own number of copies.
+		:rtype: list of int
+		"""
+		(count, adds_to) = self._counter(hand_size, variable)
+		result = []
+		for k in range(hand_size + 1):
+			drawn = [0] * len(self.cardsets)
+			for j in adds_to[0]:
+				drawn[j] += k
+			result.append(count(1, hand_size - k, tuple(drawn)))
+		return result
+
+	def exact_probability(self, hand_size=5):
+		"""
+		:returns: the chance that a hand of hand_size cards satisfies the expression
+		:rtype: fractions.Fraction
+		"""
+		return Fraction(self.successes(hand_size), choose(self.deck_size, hand_size))
+
+	def probability(self, hand_size=5):
+		"""
+		:returns: the chance that a hand of hand_size cards satisfies the expression
+		:rtype: float
+		"""
+		return float(self.exact_probability(hand_size))
+
+	def log_probability(self, hand_size=5):
+		"""
+		:returns: the natural log of the chance that a hand of hand_size cards satisfies the expression
+		:rtype: float
+		"""
+		successes = self.successes(hand_size)
+		if successes == 0:
+			return float('-inf')
+		return math.log(successes) - log_choose(self.deck_size, hand_size)
+
+class ConsistencyEvaluator(object):
+	"""Keeps the probabilities of several expressions up to date while a deck changes a few cards at a time.
+
+	Every expression's variables are worked out once, along with which variable each card falls in, so adding or removing a card only changes one copy count. The hand count is then updated incrementally: the completions of the variable that changed (see HandSpace.completions) do not depend on its own copies, so they are counted once, and every further change to the same variable is a weighted sum of a few binomials. Probabilities are also remembered by the copy counts they were computed from, which makes taking a change back again free.
+
+	Example: ::
+
+		evaluator = ConsistencyEvaluator(deck, {'starter': starters > Number(0)})
+		evaluator.remove_card(card)
+		print(evaluator.probability('starter', 6))
+		evaluator.add_card(card)
+
+	:ivar deck: the deck, which add_card and remove_card change
+	:vartype deck: YugiohDeck or YugiohSet"""
+	# the most results remembered before starting over
+	MAX_RESULTS = 4096
+
+	def __init__(self, deck, exprs=None):
+		self.deck = deck
+		self._cards = _main_deck(deck)
+		self._spaces = {}
+		self._variable_of = {}
+		self._changed = {}
+		self._completions = {}
+		self._results = {}
+		for (name, expr) in (exprs or {}).items():
+			self.add_expression(name, expr)
+
+	def add_expression(self, name, expr):
+		"""
+		Start keeping track of an expression.
+		:param name: the name to look the expression up by
+		:param expr: the constraint on the hand
+		:type expr: AST
+		"""
+		space = HandSpace(expr, self._cards)
+		self._spaces[name] = space
+		self._variable_of[name] = dict((card, i) for (i, var) in enumerate(space.variables) for card in var)
+
+	def add_card(self, card, count=1):
+		"""
+		Add copies of a card to the main deck.
+		:param card: the card to add
+		:type card: YugiohCard
+		:param count: the number of copies
+		:type count: int
+		"""
+		self._cards.add_card(card, count)
+		self._update(card, count)
+
+	def remove_card(self, card, count=1):
+		"""
+		Remove copies of a card from the main deck.
+		:param card: the card to remove
+		:type card: YugiohCard
+		:param count: the number of copies
+		:type count: int
+		"""
+		self._cards.remove_card(card, count)
+		self._update(card, -count)
+
+	def _update(self, card, change):
+		for (name, space) in self._spaces.items():
+			i = self._variable_of[name].get(card, REST)
+			if i == REST:
+				space.rest += change
+			else:
+				space.copies[i] += change
+			space.deck_size += change
+			self._changed[name] = i
+
+	def _successes(self, name, hand_size):
+		# reweight the completions of the variable that changed last, which stay the same while only that variable changes
+		space = self._spaces[name]
+		i = self._changed.get(name)
+		if i is None:
+			return space.successes(hand_size)
+		others = list(space.copies)
+		if i == REST:
+			copies = space.rest
+		else:
+			copies = others[i]
+			others[i] = None
+		key = (name, hand_size, i, tuple(others), None if i == REST else space.rest)
+		if key not in self._completions:
+			if len(self._completions) >= self.MAX_RESULTS:
+				self._completions.clear()
+			self._completions[key] = space.completions(i, hand_size)
+		completions = self._completions[key]
+		return sum(choose(copies, k) * completions[k] for k in range(min(copies, hand_size) + 1))
+
+	def exact_probability(self, name, hand_size=5):
+		"""
+		:returns: the chance that a hand of hand_size cards from the deck as it is now satisfies the named expression
+		:rtype: fractions.Fraction
+		"""
+		space = self._spaces[name]
+		key = (name, hand_size, tuple(space.copies), space.rest)
+		if key not in self._results:
+			if len(self._results) >= self.MAX_RESULTS:
+				self._results.clear()
+			self._results[key] = Fraction(self._successes(name, hand_size), choose(space.deck_size, hand_size))
+		return self._results[key]
+
+	def probability(self, name, hand_size=5):
+		"""
+		:returns: the chance that a hand of hand_size cards from the deck as it is now satisfies the named expression
+		:rtype: float
+		"""
+		return float(self.exact_probability(name, hand_size))
+
+	def probabilities(self, hand_size=5):
+		"""
+		:returns: the probability of every expression, by name
+		:rtype: dict
+		"""
+		return dict((name, self.probability(name, hand_size)) for name in self._spaces)
+
+def expr_variables(expr):
+	"""
+	:returns: the disjoint, non-empty sets of cards the expression cannot tell apart
+	:rtype: list of frozenset
+	"""
+	return [frozenset(v) for v in expr.variables(None) if len(v) > 0]
+
+def _main_deck(cards):
+	if isinstance(cards, deck.YugiohDeck):
+		return cards.main
+	return cards
+
+def probability(deck, expr, hand_size=5, exact=False):
+	"""
+	The chance of drawing an opening hand that satisfies an expression.
+	:param deck: the deck to draw from. For a YugiohDeck, the main deck.
+	:type deck: YugiohSet or YugiohDeck
+	:param expr: the constraint on the hand
+	:type expr: AST
+	:param hand_size: the number of cards drawn
+	:type hand_size: int
+	:param exact: return the chance as an exact fraction instead of a float
+	:type exact: bool
+	:rtype: float or fractions.Fraction
+	"""
+	space = HandSpace(expr, _main_deck(deck))
+	if exact:
+		return space.exact_probability(hand_size)
+	return space.probability(hand_size)
+
+GridResult = collections.namedtuple('GridResult', ['deck', 'expr', 'hand_size', 'probability'])
+
+# the problems shared with every worker process, set by _init_worker
+_GRID = None
+
+def _init_worker(decks, exprs, variables):
+	global _GRID
+	_GRID = (decks, exprs, variables)
+
+def _grid_cell(task):
+	(deck_index, expr_index, hand_sizes) = task
+	(decks, exprs, variables) = _GRID
+	space = HandSpace(exprs[expr_index], decks[deck_index], variables[expr_index])
+	return [(deck_index, expr_index, hand_size, space.probability(hand_size)) for hand_size in hand_sizes]
+
+def _keyed(things):
+	if isinstance(things, dict):
+		return list(things.keys()), list(things.values())
+	things = list(things)
+	return list(range(len(things))), things
+
+def probability_grid(decks, exprs, hand_sizes=(5, 6), processes=None, chunksize=None):
+	"""
+	The chance of drawing a satisfying opening hand for every deck, expression and hand size, spread across a pool of processes.
+
+	Every deck is sent to each worker once, when the pool starts, along with the variables of every expression. The tasks themselves are just indexes into those, and a task covers every hand size of one deck and expression so their shared setup is only done once.
+	:param decks: the decks, by name. For a YugiohDeck, the main deck is drawn from.
+	:type decks: dict or list of YugiohSet or YugiohDeck
+	:param exprs: the constraints on the hand, by name
+	:type exprs: dict or list of AST
+	:param hand_sizes: the numbers of cards drawn, such as 5 going first and 6 going second
+	:type hand_sizes: iterable of int
+	:param processes: the number of worker processes, the number of cpus by default. With 1, everything runs in this process.
+	:type processes: int
+	:param chunksize: the number of tasks handed to a worker at a time
+	:type chunksize: int
+	:returns: one row for every deck, expression and hand size, in that order. deck and expr are the keys (or list positions) they were given as.
+	:rtype: list of GridResult
+	"""
+	global _GRID
+	deck_keys, deck_values = _keyed(decks)
+	expr_keys, expr_values = _keyed(exprs)
+	deck_values = [_main_deck(d) for d in deck_values]
+	variables = [expr_variables(expr) for expr in expr_values]
+	hand_sizes = tuple(hand_sizes)
+	tasks = [(i, j, hand_sizes) for i in range(len(deck_values)) for j in range(len(expr_values))]
+
+	if processes is None:
+		processes = multiprocessing.cpu_count()
+	processes = max(1, min(processes, len(tasks)))
+	if processes == 1:
+		_init_worker(deck_values, expr_values, variables)
+		try:
+			cells = [_grid_cell(task) for task in tasks]
+		finally:
+			# this process is not a worker, so do not keep every deck alive after the grid is done
+			_GRID = None
+	else:
+		if chunksize is None:
+			# a few chunks per worker, so one slow chunk does not hold up the rest
+			chunksize = max(1, len(tasks) // (processes * 4))
+		pool = multiprocessing.Pool(processes, _init_worker, (deck_values, expr_values, variables))
+		try:
+			cells = list(pool.imap_unordered(_grid_cell, tasks, chunksize))
+		finally:
+			pool.close()
+			pool.join()
+
+	results = {}
+	for cell in cells:
+		for (i, j, hand_size, p) in cell:
+			results[(i, j, hand_size)] = p
+	table = []
+	for i in range(len(deck_values)):
+		for j in range(len(expr_values)):
+			for hand_size in hand_sizes:
+				table.append(GridResult(deck_keys[i], expr_keys[j], hand_size, results[(i, j, hand_size)]))
+	return table
@@ -1,6 +1,8 @@
 from . import ydk
 from . import text
 from . import ygojson as json
+from . import ingest
+from . import usage
 from .deck import YugiohSet, YugiohDeck
 from .meta_format import open_deck, load, dump
 from .meta_format import detect_filename_format, detect_text_format
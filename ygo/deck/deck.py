@@ -3,13 +3,43 @@
 import collections
 import itertools
 
+NUMPY_EXISTS = True
+try:
+	import numpy
+except ImportError:
+	NUMPY_EXISTS = False
+
+from ..card import YugiohCard
+
 class YugiohSet(object):
-	"""A set of yugioh cards that can be query'd"""
+	"""A set of yugioh cards that can be query'd
+
+	Iterating a set gives its cards in the order they were added. For set algebra, a set of plain cards also keeps its card ids and copy counts as two numpy arrays sorted by id, built the first time they are needed, so union, intersection, difference, distance and similarity are a handful of array operations over the ids both sets share. Sets holding other kinds of cards, such as the PrintedCards of different prints that share an id, are compared card by card instead, as is every set when numpy is missing. The arrays, the number of cards and the monster, spell and trap subsets are remembered until the set changes."""
 	def __init__(self, cards=None):
 		self._contents = {}
+		self._changed()
 		if cards:
 			self.add_cards(cards)
 
+	def _changed(self):
+		self._size = None
+		self._sorted = None
+		self._subsets = {}
+
+	@classmethod
+	def from_counts(cls, items):
+		"""
+		:param items: (card, count) pairs. Cards with no copies are left out.
+		:type items: iterable of tuple
+		:returns: a set holding count copies of every card
+		:rtype: YugiohSet
+		"""
+		result = cls()
+		for (card, count) in items:
+			if count > 0:
+				result._contents[card] = result._contents.get(card, 0) + count
+		return result
+
 	def __getitem__(self, card):
 		return self._contents.get(card, 0)
 			
@@ -17,7 +47,9 @@ class YugiohSet(object):
 		"""
 		:returns: Number of cards in the deck.
 		:rtype: int"""
-		return sum(self._contents.values())
+		if self._size is None:
+			self._size = sum(self._contents.values())
+		return self._size
 
 	def __str__(self):
 		cards = []
@@ -70,7 +102,26 @@ class YugiohSet(object):
 			self._contents[card] += count
 		else:
 			self._contents[card] = count
-			
+		self._changed()
+
+	def remove_card(self, card, count=1):
+		"""Remove copies of a card from the deck.
+		
+		:param card: the card to remove
+		:type card: card.YugiohCard
+		:param count: the number of copies to remove
+		:type count: int
+		:returns: None"""
+		assert(isinstance(count, int))
+		held = self._contents.get(card, 0)
+		if count > held:
+			raise RuntimeError('Cannot remove {} copies of {}, there are only {}'.format(count, card, held))
+		if count == held:
+			del self._contents[card]
+		else:
+			self._contents[card] = held - count
+		self._changed()
+
 	def add_cards(self, cards):
 		"""Add multiple cards to the deck.
 		
@@ -88,37 +139,132 @@ class YugiohSet(object):
 		:returns: number of copies in the deck
 		:rtype: int"""
 		return sum(self._contents.get(card, 0) for card in cards)	
-		
+
+	def sorted_counts(self):
+		"""
+		:returns: (ids, counts, cards): the card ids in increasing order, and the copy count and card for each. None if numpy is missing or the set holds anything but plain YugiohCards, whose ids are not unique (every print of a card shares its id).
+		:rtype: tuple of (numpy.ndarray, numpy.ndarray, list of card.YugiohCard)"""
+		if self._sorted is None:
+			self._sorted = False
+			if NUMPY_EXISTS and all(type(card) is YugiohCard for card in self._contents):
+				cards = list(self._contents)
+				ids = numpy.array([int(card.id) for card in cards], dtype=numpy.int64)
+				counts = numpy.array([self._contents[card] for card in cards], dtype=numpy.int64)
+				order = numpy.argsort(ids, kind='stable')
+				self._sorted = (ids[order], counts[order], [cards[i] for i in order])
+		return self._sorted or None
+
+	def _shared(self, other):
+		# the columns of both sets, and where the ids they share sit in each. None if the sets have to be compared card by card.
+		mine = self.sorted_counts()
+		theirs = other.sorted_counts()
+		if mine is None or theirs is None:
+			return None
+		(shared, at, other_at) = numpy.intersect1d(mine[0], theirs[0], assume_unique=True, return_indices=True)
+		return (mine, theirs, at, other_at)
+
+	def _merge(self, other):
+		# (card, copies here, copies in other) for every card in either set, matched by the cards' own equality
+		for (card, count) in self._contents.items():
+			yield (card, count, other._contents.get(card, 0))
+		for (card, count) in other._contents.items():
+			if card not in self._contents:
+				yield (card, 0, count)
+
+	def union(self, other):
+		"""
+		:returns: every card in either set, with the larger of its two counts
+		:rtype: YugiohSet"""
+		aligned = self._shared(other)
+		if aligned is None:
+			return YugiohSet.from_counts((card, max(a, b)) for (card, a, b) in self._merge(other))
+		((ids, counts, cards), (other_ids, other_counts, other_cards), at, other_at) = aligned
+		counts = counts.copy()
+		counts[at] = numpy.maximum(counts[at], other_counts[other_at])
+		only_theirs = numpy.ones(len(other_ids), dtype=bool)
+		only_theirs[other_at] = False
+		only_theirs = numpy.flatnonzero(only_theirs)
+		return YugiohSet.from_counts(itertools.chain(
+			zip(cards, counts.tolist()),
+			zip([other_cards[i] for i in only_theirs], other_counts[only_theirs].tolist())))
+
+	def intersection(self, other):
+		"""
+		:returns: every card in both sets, with the smaller of its two counts
+		:rtype: YugiohSet"""
+		aligned = self._shared(other)
+		if aligned is None:
+			return YugiohSet.from_counts((card, min(a, b)) for (card, a, b) in self._merge(other))
+		((ids, counts, cards), (other_ids, other_counts, other_cards), at, other_at) = aligned
+		return YugiohSet.from_counts(zip([cards[i] for i in at], numpy.minimum(counts[at], other_counts[other_at]).tolist()))
+
+	def difference(self, other):
+		"""
+		:returns: the copies in this set that are not matched by a copy in the other
+		:rtype: YugiohSet"""
+		aligned = self._shared(other)
+		if aligned is None:
+			return YugiohSet.from_counts((card, a - b) for (card, a, b) in self._merge(other))
+		((ids, counts, cards), (other_ids, other_counts, other_cards), at, other_at) = aligned
+		counts = counts.copy()
+		counts[at] -= other_counts[other_at]
+		return YugiohSet.from_counts(zip(cards, counts.tolist()))
+
+	def _overlap(self, other):
+		# (copies shared, copies in either) between the sets
+		aligned = self._shared(other)
+		if aligned is None:
+			shared = 0
+			total = 0
+			for (card, a, b) in self._merge(other):
+				shared += min(a, b)
+				total += max(a, b)
+			return (shared, total)
+		((ids, counts, cards), (other_ids, other_counts, other_cards), at, other_at) = aligned
+		shared = int(numpy.minimum(counts[at], other_counts[other_at]).sum())
+		return (shared, int(counts.sum() + other_counts.sum()) - shared)
+
+	def distance(self, other):
+		"""
+		:returns: the number of copies that have to be added or removed to turn one set into the other
+		:rtype: int"""
+		(shared, total) = self._overlap(other)
+		return total - shared
+
+	def similarity(self, other):
+		"""
+		:returns: the copies the sets share over the copies in either of them, from 0 (nothing in common) to 1 (the same cards)
+		:rtype: float"""
+		(shared, total) = self._overlap(other)
+		return float(shared) / total if total else 1.0
+
+	__or__ = union
+	__and__ = intersection
+	__sub__ = difference
+
+	def _subset(self, name, test):
+		if name not in self._subsets:
+			self._subsets[name] = [(card, count) for (card, count) in self._contents.items() if test(card)]
+		return YugiohSet.from_counts(self._subsets[name])
+
 	def monsters(self):
-		result = []
-		for card in self.values():
-			if card.is_monster():
-				result.append(card)
-		return YugiohSet(result)
+		return self._subset('monsters', lambda card: card.is_monster())
 		
 	def spells(self, unique=True):
-		result = []
-		for card in self.values():
-			if card.is_spell():
-				result.append(card)
-		return YugiohSet(result)
+		return self._subset('spells', lambda card: card.is_spell())
 		
 	def traps(self, unique=True):
-		result = []
-		for card in self.values():
-			if card.is_trap():
-				result.append(card)
-		return YugiohSet(result)
+		return self._subset('traps', lambda card: card.is_trap())
 
 	def as_deck(self):
 		main = []
 		extra = []
-		for card in self.values():
+		for (card, count) in self._contents.items():
 			if card.in_main_deck():
-				main.append(card)
+				main.append((card, count))
 			elif card.in_extra_deck():
-				extra.append(card)
-		return YugiohDeck('', '', main_deck=main, extra_deck=extra)
+				extra.append((card, count))
+		return YugiohDeck(YugiohSet.from_counts(main), None, YugiohSet.from_counts(extra))
 		
 class YugiohDeck(dict):
 	"""A full yugioh deck, containing main, side, and extra decks
@@ -138,9 +284,9 @@ class YugiohDeck(dict):
 	:ivar extra: The extra deck
 	:vartype extra: YugiohSet"""
 	def __init__(self, main=None, side=None, extra=None, name="", author=""):
-		main = main or YugiohSet()
-		side = side or YugiohSet()
-		extra = extra or YugiohSet()
+		main = YugiohSet() if main is None else main
+		side = YugiohSet() if side is None else side
+		extra = YugiohSet() if extra is None else extra
 		dict.__init__(self, {
 			'name': name,
 			'author': author,
@@ -158,4 +304,4 @@ class YugiohDeck(dict):
 		"""
 		:returns: A single YugiohSet holding every card in the deck, between main, extra, and side.
 		:rtype: YugiohSet"""
-		return YugiohSet(itertools.chain(self.main.enumerate(), self.side.enumerate(), self.extra.enumerate()))
+		return YugiohSet(itertools.chain(self.main.values(), self.side.values(), self.extra.values()))
@@ -0,0 +1,138 @@
+"""
+Streams .ydk decks out of a directory, a glob or a tar archive, for reading tournament dumps of any size.
+
+Files are read and parsed by a pool of worker processes, a chunk at a time, and only a fixed number of chunks are in flight at once, so memory use does not grow with the size of the dump. Card ids are resolved in the calling process, against one card source shared by every deck. A file that cannot be read or parsed, or that names a card the card source does not have, gives a result with an error instead of stopping the stream. ::
+
+	with Session(path, catalog=True) as s:
+		for result in s.ingest('dumps/regionals.tar.gz'):
+			if result.error:
+				print(result.source, result.error)
+"""
+import os
+import glob
+import fnmatch
+import tarfile
+import collections
+import multiprocessing
+
+from . import ydk
+from ..ygopro import CardNotFoundException
+
+IngestResult = collections.namedtuple('IngestResult', ['source', 'deck', 'error'])
+
+CHUNK_SIZE = 64
+
+# chunks handed to the pool at once, per worker
+WINDOW = 4
+
+def find_sources(target, pattern='*.ydk'):
+	"""
+	List the deck files in a directory (recursively), tar archive or glob.
+	:param target: a directory, a tar archive (compressed or not), or a glob pattern
+	:type target: str
+	:param pattern: the file names to pick up in a directory or archive
+	:type pattern: str
+	:returns: (source, path, data) for every file. For a file on disk, path is its path and data is None. For an archive member, path is None and data holds its contents.
+	:rtype: iterator of tuple
+	"""
+	if os.path.isdir(target):
+		for (root, dirs, files) in os.walk(target):
+			dirs.sort()
+			for name in sorted(files):
+				if fnmatch.fnmatch(name, pattern):
+					path = os.path.join(root, name)
+					yield (path, path, None)
+	elif os.path.isfile(target) and tarfile.is_tarfile(target):
+		# stream mode reads the archive front to back once
+		with tarfile.open(target, 'r|*') as archive:
+			for member in archive:
+				data = None
+				if member.isfile() and fnmatch.fnmatch(os.path.basename(member.name), pattern):
+					source = '{0}:{1}'.format(target, member.name)
+					data = archive.extractfile(member).read()
+				# tarfile still keeps every member it has read, so drop them as we go
+				archive.members = []
+				if data is not None:
+					yield (source, None, data)
+	else:
+		for path in sorted(glob.glob(target)):
+			if os.path.isfile(path):
+				yield (path, path, None)
+
+def _parse_chunk(chunk):
+	results = []
+	for (source, path, data) in chunk:
+		try:
+			if path is not None:
+				with open(path, 'rb') as fl:
+					data = fl.read()
+			text = data.decode('utf-8-sig')
+			results.append((source, ydk.parse(text), None))
+		except (IOError, OSError, UnicodeDecodeError, ValueError) as e:
+			results.append((source, None, str(e)))
+	return results
+
+def _chunks(iterable, size):
+	chunk = []
+	for item in iterable:
+		chunk.append(item)
+		if len(chunk) == size:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+def _resolve(parsed_chunk, card_source):
+	for (source, parsed, error) in parsed_chunk:
+		if error is not None:
+			yield IngestResult(source, None, error)
+			continue
+		try:
+			yield IngestResult(source, ydk.resolve(parsed, card_source), None)
+		except CardNotFoundException as e:
+			yield IngestResult(source, None, str(e))
+
+def ingest(target, card_source, processes=None, pattern='*.ydk', chunk_size=CHUNK_SIZE, window=None):
+	"""
+	Read every deck in a directory, tar archive or glob, lazily and in order.
+	:param target: a directory, a tar archive, or a glob pattern
+	:type target: str
+	:param card_source: the database to look card ids up in. Loading its catalog first keeps every lookup in memory.
+	:type card_source: ygopro.YGOProDatabase
+	:param processes: the number of worker processes, the number of cpus by default. With 1, everything runs in this process.
+	:type processes: int
+	:param pattern: the file names to pick up in a directory or archive
+	:type pattern: str
+	:param chunk_size: the number of files a worker parses at a time
+	:type chunk_size: int
+	:param window: the most chunks in flight at once, WINDOW per worker by default
+	:type window: int
+	:returns: one result per file, with either the deck or an error message
+	:rtype: iterator of IngestResult
+	"""
+	chunks = _chunks(find_sources(target, pattern), chunk_size)
+	if processes is None:
+		processes = multiprocessing.cpu_count()
+	if processes <= 1:
+		for chunk in chunks:
+			for result in _resolve(_parse_chunk(chunk), card_source):
+				yield result
+		return
+
+	if window is None:
+		window = WINDOW * processes
+	pool = multiprocessing.Pool(processes)
+	try:
+		pending = collections.deque()
+		for chunk in chunks:
+			pending.append(pool.apply_async(_parse_chunk, (chunk,)))
+			if len(pending) >= window:
+				for result in _resolve(pending.popleft().get(), card_source):
+					yield result
+		while pending:
+			for result in _resolve(pending.popleft().get(), card_source):
+				yield result
+	finally:
+		# also reached when the caller stops reading early
+		pool.terminate()
+		pool.join()
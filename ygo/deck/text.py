@@ -82,10 +82,14 @@ def load(text, card_source):
 				count = trail.group(2)
 				name = trail.group(1)
 				
-			card = card_source.find_name(name)		
-			for i in count:
-				current.append(card)
-				
+			for i in range(int(count)):
+				current.append(name)
+
+	# resolve every card in the deck with a single lookup
+	cards = card_source.find_names(main + extra + side)
+	main = [cards[name] for name in main]
+	extra = [cards[name] for name in extra]
+	side = [cards[name] for name in side]
 	return YugiohDeck(main, side, extra, title, author)
 
 def dump(deck):
@@ -96,17 +100,20 @@ def dump(deck):
 	output.append(deck.name)
 	output.append("by {0}".format(deck.author))
 	output.append('Main Deck')
-	output.append('  Monsters ({})'.format(len(deck.main.monsters())))
-	for monster in deck.main.monsters():
-		output.append("    {0} x{1}".format(monster.name, deck.main.count(monster)))
+	monsters = deck.main.monsters()
+	output.append('  Monsters ({})'.format(len(monsters)))
+	for monster, count in monsters.items():
+		output.append("    {0} x{1}".format(monster.name, count))
 
-	output.append('  Spells ({})'.format(len(deck.main.spells())))
-	for spell in deck.main.spells():
-		output.append("    {0} x{1}".format(spell.name, deck.main.count(spell)))
+	spells = deck.main.spells()
+	output.append('  Spells ({})'.format(len(spells)))
+	for spell, count in spells.items():
+		output.append("    {0} x{1}".format(spell.name, count))
 
-	output.append('  Traps ({})'.format(len(deck.main.traps())))
-	for trap in deck.main.traps():
-		output.append("    {0} x{1}".format(trap.name, deck.main.count(trap)))
+	traps = deck.main.traps()
+	output.append('  Traps ({})'.format(len(traps)))
+	for trap, count in traps.items():
+		output.append("    {0} x{1}".format(trap.name, count))
 	
 	output.append("Extra Deck ({0})".format(len(deck.extra)))
 	for monster in deck.extra:
@@ -0,0 +1,261 @@
+"""
+Card usage statistics over a corpus of decks: how many decks play each card, how many copies, in which part of the deck, and which cards are played together.
+
+Cards are numbered in the order they are first seen, and every statistic is an array indexed by that number, so the memory used depends on the number of distinct cards, not on the number of decks. Co-occurrence counts are kept as a sparse, sorted array of card pairs. Pairs from new decks are buffered and folded in a batch at a time. Partial results built by separate workers can be merged. ::
+
+	usage = Usage()
+	for result in session.ingest('dumps/'):
+		if result.deck is not None:
+			usage.add_deck(result.deck)
+	print(usage.inclusion_rate(card.id), usage.average_copies(card.id, 'main'))
+"""
+from array import array
+
+NUMPY_EXISTS = True
+try:
+	import numpy
+except ImportError:
+	NUMPY_EXISTS = False
+
+SECTIONS = ['main', 'extra', 'side']
+
+# card numbers are packed two to a pair key, with this many values for the second
+PAIR_BASE = 1 << 24
+
+# pair keys buffered before they are folded into the totals
+FLUSH_SIZE = 1 << 20
+
+class Usage(object):
+	"""Usage statistics for every card seen in a set of decks.
+
+	:ivar decks: the number of decks added
+	:vartype decks: int
+	:ivar ids: the card id of every card number
+	:vartype ids: array of int
+	:ivar including: for every section, the number of decks that play each card there
+	:vartype including: dict of array
+	:ivar copies: for every section, the total copies of each card played there
+	:vartype copies: dict of array
+	:ivar any_section: the number of decks that play each card anywhere
+	:vartype any_section: array of int"""
+	def __init__(self, cooccurrence=True):
+		if cooccurrence and not NUMPY_EXISTS:
+			raise ImportError("No module named 'numpy'")
+		self.decks = 0
+		self.ids = array('l')
+		self.index = {}
+		self.including = dict((section, array('l')) for section in SECTIONS)
+		self.copies = dict((section, array('l')) for section in SECTIONS)
+		self.any_section = array('l')
+		self.cooccurrence = cooccurrence
+		self._pair_keys = None
+		self._pair_counts = None
+		self._buffer = []
+		self._buffered = 0
+		if cooccurrence:
+			self._pair_keys = numpy.zeros(0, dtype=numpy.int64)
+			self._pair_counts = numpy.zeros(0, dtype=numpy.int64)
+
+	def __len__(self):
+		return self.decks
+
+	def _number(self, cid):
+		# the card number of an id, given a new one the first time it is seen
+		number = self.index.get(cid)
+		if number is None:
+			number = len(self.ids)
+			self.index[cid] = number
+			self.ids.append(cid)
+			for section in SECTIONS:
+				self.including[section].append(0)
+				self.copies[section].append(0)
+			self.any_section.append(0)
+		return number
+
+	def add_deck(self, deck):
+		"""
+		Count one deck.
+		:param deck: the deck
+		:type deck: YugiohDeck
+		"""
+		self.decks += 1
+		seen = set()
+		for section in SECTIONS:
+			including = self.including[section]
+			copies = self.copies[section]
+			for (card, count) in deck[section].items():
+				number = self._number(int(card.id))
+				including[number] += 1
+				copies[number] += count
+				seen.add(number)
+		for number in seen:
+			self.any_section[number] += 1
+		if self.cooccurrence and len(seen) > 1:
+			numbers = numpy.array(sorted(seen), dtype=numpy.int64)
+			(first, second) = numpy.triu_indices(len(numbers), 1)
+			self._buffer.append(numbers[first] * PAIR_BASE + numbers[second])
+			self._buffered += len(first)
+			if self._buffered >= FLUSH_SIZE:
+				self._flush()
+
+	def add_decks(self, decks):
+		"""
+		Count every deck of an iterable, in one pass.
+		:param decks: the decks
+		:type decks: iterable of YugiohDeck
+		:returns: self
+		"""
+		for deck in decks:
+			self.add_deck(deck)
+		return self
+
+	def _flush(self):
+		if not self._buffer:
+			return
+		keys = numpy.concatenate(self._buffer)
+		self._buffer = []
+		self._buffered = 0
+		self._add_pairs(keys, numpy.ones(len(keys), dtype=numpy.int64))
+
+	def _add_pairs(self, keys, counts):
+		keys = numpy.concatenate([self._pair_keys, keys])
+		counts = numpy.concatenate([self._pair_counts, counts])
+		(self._pair_keys, inverse) = numpy.unique(keys, return_inverse=True)
+		self._pair_counts = numpy.bincount(inverse.reshape(-1), weights=counts, minlength=len(self._pair_keys)).astype(numpy.int64)
+
+	def merge(self, other):
+		"""
+		Add the statistics of another Usage, such as one built by a separate worker.
+		:param other: the statistics to add
+		:type other: Usage
+		:returns: self
+		"""
+		if self.cooccurrence and not other.cooccurrence:
+			raise RuntimeError('Cannot merge usage without co-occurrence counts into usage with them')
+		self.decks += other.decks
+		renumber = array('l', [self._number(cid) for cid in other.ids])
+		for section in SECTIONS:
+			for (theirs, ours) in enumerate(renumber):
+				self.including[section][ours] += other.including[section][theirs]
+				self.copies[section][ours] += other.copies[section][theirs]
+		for (theirs, ours) in enumerate(renumber):
+			self.any_section[ours] += other.any_section[theirs]
+		if self.cooccurrence:
+			other._flush()
+			self._flush()
+			if len(other._pair_keys):
+				mapping = numpy.array(renumber, dtype=numpy.int64)
+				first = mapping[other._pair_keys // PAIR_BASE]
+				second = mapping[other._pair_keys % PAIR_BASE]
+				keys = numpy.minimum(first, second) * PAIR_BASE + numpy.maximum(first, second)
+				self._add_pairs(keys, other._pair_counts)
+		return self
+
+	def cards(self):
+		"""
+		:returns: the id of every card seen, in the order first seen
+		:rtype: list of int
+		"""
+		return list(self.ids)
+
+	def _lookup(self, cid):
+		return self.index.get(int(cid))
+
+	def inclusion_rate(self, cid, section=None):
+		"""
+		:param cid: the card id
+		:param section: 'main', 'extra' or 'side'. If None, anywhere in the deck.
+		:returns: the share of decks that play the card
+		:rtype: float
+		"""
+		number = self._lookup(cid)
+		if number is None or self.decks == 0:
+			return 0.0
+		counts = self.any_section if section is None else self.including[section]
+		return float(counts[number]) / self.decks
+
+	def average_copies(self, cid, section=None):
+		"""
+		:param cid: the card id
+		:param section: 'main', 'extra' or 'side'. If None, the whole deck.
+		:returns: the average number of copies played, among the decks that play the card there
+		:rtype: float
+		"""
+		number = self._lookup(cid)
+		if number is None:
+			return 0.0
+		if section is None:
+			copies = sum(self.copies[s][number] for s in SECTIONS)
+			decks = self.any_section[number]
+		else:
+			copies = self.copies[section][number]
+			decks = self.including[section][number]
+		return float(copies) / decks if decks else 0.0
+
+	def split(self, cid):
+		"""
+		:param cid: the card id
+		:returns: the total copies played in each section
+		:rtype: dict of section to int
+		"""
+		number = self._lookup(cid)
+		return dict((section, 0 if number is None else self.copies[section][number]) for section in SECTIONS)
+
+	def together(self, a, b):
+		"""
+		:param a: a card id
+		:param b: another card id
+		:returns: the number of decks that play both cards
+		:rtype: int
+		"""
+		if not self.cooccurrence:
+			raise RuntimeError('Co-occurrence was not counted')
+		self._flush()
+		(first, second) = (self._lookup(a), self._lookup(b))
+		if first is None or second is None or first == second:
+			return 0
+		key = min(first, second) * PAIR_BASE + max(first, second)
+		at = numpy.searchsorted(self._pair_keys, key)
+		if at < len(self._pair_keys) and self._pair_keys[at] == key:
+			return int(self._pair_counts[at])
+		return 0
+
+	def played_with(self, cid, limit=None):
+		"""
+		:param cid: the card id
+		:param limit: if given, only the most common cards
+		:returns: (card id, number of decks playing both) for every card played alongside the card, most common first
+		:rtype: list of tuple
+		"""
+		if not self.cooccurrence:
+			raise RuntimeError('Co-occurrence was not counted')
+		self._flush()
+		number = self._lookup(cid)
+		if number is None:
+			return []
+		first = self._pair_keys // PAIR_BASE
+		second = self._pair_keys % PAIR_BASE
+		mine = (first == number) | (second == number)
+		others = numpy.where(first[mine] == number, second[mine], first[mine])
+		counts = self._pair_counts[mine]
+		order = numpy.argsort(-counts, kind='stable')
+		if limit is not None:
+			order = order[:limit]
+		return [(self.ids[int(others[i])], int(counts[i])) for i in order]
+
+	def __getstate__(self):
+		# pickled to send partial results between processes, so fold the buffer in first
+		if self.cooccurrence:
+			self._flush()
+		return self.__dict__
+
+def aggregate(decks, cooccurrence=True):
+	"""
+	Build usage statistics from decks in one pass.
+	:param decks: the decks, such as the decks of ingest results
+	:type decks: iterable of YugiohDeck
+	:param cooccurrence: also count which cards are played together (needs numpy)
+	:type cooccurrence: bool
+	:rtype: Usage
+	"""
+	return Usage(cooccurrence).add_decks(decks)
@@ -27,6 +27,15 @@ def load(text, card_source):
 :type card_source: core.ygopro.YGOProDatabase
 :returns: the deck
 :rtype: core.deck.YugiohDeck"""
+	return resolve(parse(text), card_source)
+
+def parse(text):
+	"""Splits a .ydk file into its card ids, without looking any of them up.
+	
+:param text: the contents of the decklist file as text
+:type text: string
+:returns: (main, side, extra, title, author), where main, side and extra are lists of card ids
+:rtype: tuple"""
 	main = []
 	side = []
 	extra = []
@@ -50,10 +59,25 @@ def load(text, card_source):
 			current = extra
 		elif line.startswith('!side'):
 			current = side
-		else:
-			cid = line.rstrip()
-			card = card_source.find_id(cid)
-			current.append(card)
+		elif line:
+			current.append(line)
+	return (main, side, extra, title, author)
+
+def resolve(parsed, card_source):
+	"""Looks up the cards of a parsed .ydk file.
+	
+:param parsed: the result of parse
+:type parsed: tuple
+:param card_source: some database that allows finding cards by id
+:type card_source: core.ygopro.YGOProDatabase
+:returns: the deck
+:rtype: core.deck.YugiohDeck"""
+	(main, side, extra, title, author) = parsed
+	# resolve every card in the deck with a single lookup
+	cards = card_source.find_ids(main + extra + side)
+	main = [cards[cid] for cid in main]
+	extra = [cards[cid] for cid in extra]
+	side = [cards[cid] for cid in side]
 	return YugiohDeck(main, side, extra, title, author)
 	
 def dump(deck):
@@ -43,10 +43,10 @@ def dump(thing):
 	else:
 		return json.dumps(thing)
 
-def _load_set(tree, card_source):
+def _load_set(tree, cards):
 	result = []
 	for key, count in tree.items():
-		card = card_source.find_name(key)
+		card = cards[key]
 		for i in range(count):
 			result.append(card)
 	return YugiohSet(result)
@@ -58,9 +58,12 @@ def _is_not_ygojson_deck(tree):
 def _load_deck(tree, card_source):
 	if _is_not_ygojson_deck(tree):		
 		raise YGOJsonParseError('Deck object does not contain all the neccesary tags')
-	main = _load_set(tree['main'], card_source)
-	side = _load_set(tree['side'], card_source)
-	extra = _load_set(tree['extra'], card_source)
+	# resolve every card in the deck with a single lookup
+	names = list(tree['main']) + list(tree['side']) + list(tree['extra'])
+	cards = card_source.find_names(names)
+	main = _load_set(tree['main'], cards)
+	side = _load_set(tree['side'], cards)
+	extra = _load_set(tree['extra'], cards)
 	name = tree['name']
 	author = tree['author']
 	return YugiohDeck(main, side, extra, name, author)
@@ -0,0 +1,180 @@
+"""
+Estimates consistency probabilities by drawing random opening hands, for expressions, decks or hand sizes where counting every hand exactly with consistency.probability takes too long.
+
+Example: ::
+
+	starters = consistency.Cardset(deck.main.monsters())
+	result = montecarlo.estimate(deck, starters > consistency.Number(0), hand_size=6, precision=0.001)
+	print(result.probability, result.low, result.high)
+
+The deck is encoded once as an array with one entry per copy, and hands are drawn in batches with numpy. For every card set of the expression the simulator keeps a row of which copies belong to it, so the number of its cards in each hand of a batch is a single sum, and the expression is evaluated on those counts for the whole batch at once (see consistency.AST.evaluate).
+"""
+import math
+
+NUMPY_EXISTS = True
+try:
+	import numpy
+except ImportError:
+	NUMPY_EXISTS = False
+
+from . import consistency
+
+BATCH_SIZE = 50000
+
+MAX_SAMPLES = 1000000
+
+def z_score(confidence):
+	"""
+	:param confidence: the chance that the interval contains the true probability, between 0 and 1
+	:type confidence: float
+	:returns: how many standard deviations either side of the mean cover that chance of a normal distribution
+	:rtype: float
+	"""
+	low, high = 0.0, 40.0
+	for i in range(100):
+		middle = (low + high) / 2
+		if math.erf(middle / math.sqrt(2)) < confidence:
+			low = middle
+		else:
+			high = middle
+	return (low + high) / 2
+
+class Estimate(object):
+	"""The result of a simulation.
+
+	:ivar successes: the number of hands that satisfied the expression
+	:vartype successes: int
+	:ivar samples: the number of hands drawn
+	:vartype samples: int
+	:ivar probability: the estimated chance of satisfying the expression
+	:vartype probability: float
+	:ivar low: the lower end of the confidence interval
+	:vartype low: float
+	:ivar high: the upper end of the confidence interval
+	:vartype high: float"""
+	def __init__(self, successes, samples, confidence=0.95):
+		self.successes = successes
+		self.samples = samples
+		self.confidence = confidence
+		self.probability = float(successes) / samples if samples else 0.0
+		self.low, self.high = self._interval()
+
+	def _interval(self):
+		# the wilson score interval, which stays inside [0, 1] even when almost every hand passes or fails
+		if self.samples == 0:
+			return (0.0, 1.0)
+		z = z_score(self.confidence)
+		n = float(self.samples)
+		p = self.probability
+		center = (p + z * z / (2 * n)) / (1 + z * z / n)
+		spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+		return (max(0.0, center - spread), min(1.0, center + spread))
+
+	@property
+	def half_width(self):
+		return (self.high - self.low) / 2
+
+	def __str__(self):
+		return '{0:.4f} ({1:.4f} - {2:.4f}, {3} hands)'.format(self.probability, self.low, self.high, self.samples)
+
+	def __repr__(self):
+		return 'Estimate({0}, {1}, {2})'.format(self.successes, self.samples, self.confidence)
+
+class Simulator(object):
+	"""Draws random hands from one deck and tests them against one expression.
+
+	:ivar cards: every copy in the deck, in the order of the encoding
+	:vartype cards: list of YugiohCard
+	:ivar cardsets: the card sets the expression counts
+	:vartype cardsets: list of frozenset
+	:ivar membership: one row per card set, true for the copies that belong to it
+	:vartype membership: numpy.ndarray of bool"""
+	def __init__(self, deck, expr, seed=None):
+		if not NUMPY_EXISTS:
+			raise ImportError("No module named 'numpy'")
+		self.expr = expr
+		self.cards = list(consistency._main_deck(deck).values())
+		self.cardsets = []
+		for cardset in expr.cardsets():
+			if len(cardset) > 0 and cardset not in self.cardsets:
+				self.cardsets.append(cardset)
+		self.membership = numpy.array(
+			[[card in cardset for card in self.cards] for cardset in self.cardsets],
+			dtype=bool).reshape(len(self.cardsets), len(self.cards))
+		self.random = numpy.random.default_rng(seed)
+
+	def draw(self, count, hand_size=5):
+		"""
+		:param count: the number of hands to draw
+		:type count: int
+		:param hand_size: the number of cards in each hand
+		:type hand_size: int
+		:returns: one row per hand, holding the positions of its cards in the encoded deck
+		:rtype: numpy.ndarray of int
+		"""
+		deck_size = len(self.cards)
+		if hand_size > deck_size:
+			raise RuntimeError('Cannot draw {} cards from a deck of {}'.format(hand_size, deck_size))
+		if hand_size == deck_size:
+			return numpy.tile(numpy.arange(deck_size), (count, 1))
+		# the positions with the hand_size smallest random keys are a uniform sample without replacement
+		keys = self.random.random((count, deck_size))
+		return numpy.argpartition(keys, hand_size, axis=1)[:, :hand_size]
+
+	def trial(self, count, hand_size=5):
+		"""
+		:returns: the number of hands out of count random hands that satisfy the expression
+		:rtype: int
+		"""
+		hands = self.draw(count, hand_size)
+		held = self.membership[:, hands].sum(axis=2)
+		counts = dict(zip(self.cardsets, held))
+		passed = self.expr.evaluate(counts, hand_size)
+		if not isinstance(passed, numpy.ndarray):
+			# the expression does not depend on the hand
+			return count if passed else 0
+		return int(numpy.count_nonzero(passed))
+
+	def run(self, hand_size=5, precision=None, confidence=0.95, max_samples=MAX_SAMPLES, batch_size=BATCH_SIZE):
+		"""
+		Draw hands in batches until the estimate is precise enough.
+		:param hand_size: the number of cards in each hand
+		:type hand_size: int
+		:param precision: stop once the confidence interval is at most this far either side of the estimate. If None, draw max_samples hands.
+		:type precision: float
+		:param confidence: the confidence level of the interval
+		:type confidence: float
+		:param max_samples: the most hands to draw
+		:type max_samples: int
+		:param batch_size: the number of hands drawn at once
+		:type batch_size: int
+		:rtype: Estimate
+		"""
+		successes = 0
+		samples = 0
+		result = Estimate(successes, samples, confidence)
+		while samples < max_samples:
+			count = min(batch_size, max_samples - samples)
+			successes += self.trial(count, hand_size)
+			samples += count
+			result = Estimate(successes, samples, confidence)
+			if precision is not None and result.half_width <= precision:
+				break
+		return result
+
+def estimate(deck, expr, hand_size=5, precision=None, confidence=0.95, max_samples=MAX_SAMPLES, seed=None):
+	"""
+	Estimate the chance of drawing an opening hand that satisfies an expression.
+	:param deck: the deck to draw from. For a YugiohDeck, the main deck.
+	:type deck: YugiohSet or YugiohDeck
+	:param expr: the constraint on the hand
+	:type expr: consistency.AST
+	:param hand_size: the number of cards drawn
+	:type hand_size: int
+	:param precision: the largest acceptable distance from the estimate to either end of its confidence interval
+	:type precision: float
+	:param seed: seeds the random number generator, for repeatable results
+	:rtype: Estimate
+	"""
+	simulator = Simulator(deck, expr, seed)
+	return simulator.run(hand_size, precision, confidence, max_samples)
@@ -0,0 +1,147 @@
+"""
+A price cache kept in a local sqlite file, so the same card is only fetched from the price api once a day instead of on every lookup.
+
+The cache stores the api's rows for every card name along with when they were fetched. Rows younger than the ttl are served as they are. Older rows are still served straight away, but the card is refetched in a background thread so the next lookup gets fresh prices. Cards the api has no prices for are remembered too, for the shorter negative_ttl, so a typo or a brand new card does not cost a request every time it shows up. ::
+
+	cache = PriceCache('prices.sqlite')
+	for printing in cache.price_data(card):
+		print(printing.print_tag, printing.price.average)
+"""
+import json
+import time
+import sqlite3
+import threading
+
+from . import yugiohprices
+
+# one day
+TTL = 24 * 60 * 60
+
+# one hour
+NEGATIVE_TTL = 60 * 60
+
+class PriceCache(object):
+	"""Card price data, cached by card name in an sqlite file.
+
+	:ivar ttl: seconds before cached prices are refreshed
+	:vartype ttl: float
+	:ivar negative_ttl: seconds before a card without prices is asked about again
+	:vartype negative_ttl: float
+	:ivar stale_while_revalidate: if True, serve expired prices while refreshing them in the background. Otherwise refresh them before answering.
+	:vartype stale_while_revalidate: bool"""
+	def __init__(self, path, ttl=TTL, negative_ttl=NEGATIVE_TTL, stale_while_revalidate=True, fetch=None):
+		self.path = path
+		self.ttl = ttl
+		self.negative_ttl = negative_ttl
+		self.stale_while_revalidate = stale_while_revalidate
+		self.fetch = fetch or yugiohprices.fetch_price_rows
+		self._lock = threading.Lock()
+		self._refreshing = set()
+		self._threads = set()
+		self._closed = False
+		self._connection = sqlite3.connect(path, check_same_thread=False)
+		with self._lock:
+			self._connection.execute('CREATE TABLE IF NOT EXISTS prices (name TEXT PRIMARY KEY, rows TEXT, fetched REAL)')
+			self._connection.commit()
+
+	def close(self, wait=True):
+		"""
+		Close the cache file.
+		:param wait: if True, let the background refreshes still running finish first. Otherwise their prices are dropped.
+		:type wait: bool
+		"""
+		if wait:
+			with self._lock:
+				threads = list(self._threads)
+			for thread in threads:
+				thread.join()
+		with self._lock:
+			self._closed = True
+			self._connection.close()
+
+	def _read(self, name):
+		with self._lock:
+			row = self._connection.execute('SELECT rows, fetched FROM prices WHERE name = ?', (name,)).fetchone()
+		if row is None:
+			return None
+		return (json.loads(row[0]), row[1])
+
+	def _write(self, name, rows):
+		with self._lock:
+			if self._closed:
+				# a background refresh that finished after close
+				return
+			self._connection.execute('INSERT OR REPLACE INTO prices VALUES (?, ?, ?)', (name, json.dumps(rows), time.time()))
+			self._connection.commit()
+
+	def _expired(self, rows, fetched):
+		ttl = self.ttl if _has_prices(rows) else self.negative_ttl
+		return time.time() - fetched >= ttl
+
+	def refresh(self, card):
+		"""
+		Fetch a card's prices from the api and cache them.
+		:returns: the api's rows for the card
+		:rtype: list of dict
+		"""
+		rows = self.fetch(card)
+		self._write(card.name, rows)
+		return rows
+
+	def _refresh_later(self, card):
+		with self._lock:
+			if self._closed or card.name in self._refreshing:
+				return
+			self._refreshing.add(card.name)
+			thread = threading.Thread(target=self._background_refresh, args=(card,))
+			thread.daemon = True
+			self._threads.add(thread)
+		thread.start()
+
+	def _background_refresh(self, card):
+		try:
+			self.refresh(card)
+		except (IOError, OSError, ValueError, sqlite3.Error, yugiohprices.APIError):
+			# keep serving the old prices, and try again on a later lookup
+			pass
+		finally:
+			with self._lock:
+				self._refreshing.discard(card.name)
+				self._threads.discard(threading.current_thread())
+
+	def price_rows(self, card):
+		"""
+		:returns: the api's rows for a card, from the cache where possible
+		:rtype: list of dict
+		"""
+		cached = self._read(card.name)
+		if cached is None:
+			return self.refresh(card)
+		(rows, fetched) = cached
+		if self._expired(rows, fetched):
+			if not self.stale_while_revalidate:
+				return self.refresh(card)
+			self._refresh_later(card)
+		return rows
+
+	def price_data(self, card):
+		"""
+		The cached equivalent of yugiohprices.get_price_data.
+		:rtype: list of yugiohprices.PrintedCard
+		"""
+		return yugiohprices.printed_cards(card, self.price_rows(card))
+
+	def price_data_many(self, cards):
+		"""
+		The cached equivalent of yugiohprices.get_price_data_many. Only the cards missing from the cache are fetched.
+		:rtype: list of lists of yugiohprices.PrintedCard
+		"""
+		return yugiohprices.get_price_data_many(cards, fetch=self.price_data)
+
+def _has_prices(rows):
+	# whether any print run of the api's answer came with prices
+	for run in rows:
+		price_data = run.get('price_data', {})
+		if price_data.get('status') == 'success':
+			return True
+	return False
@@ -0,0 +1,192 @@
+"""
+An offline snapshot of card prices, for pricing decks without asking the price api anything.
+
+A snapshot maps every card name to its print runs, each kept as just the print tag, the rarity and the price summary (the listings are dropped). It is saved as a single file and loaded with one read. Snapshots are built from dumps of price api responses, or from a pricecache database. ::
+
+	snapshot = PriceSnapshot.import_responses(['dumps/prices-2016-05.jsonl'])
+	snapshot.save('prices.snapshot')
+
+	with Session(path, price_snapshot='prices.snapshot') as s:
+		print(s.get_price(card))
+"""
+import json
+import time
+import pickle
+import sqlite3
+
+from . import yugiohprices
+
+SNAPSHOT_VERSION = 1
+
+class PriceSnapshot(object):
+	"""Card prices by card name.
+
+	:ivar prices: the print runs of every card, as (print_tag, rarity, price summary) tuples. The summary is a dict, or None if the api had no prices for the print run.
+	:vartype prices: dict of str to list of tuple
+	:ivar created: when the snapshot was made, in seconds since the epoch
+	:vartype created: float"""
+	def __init__(self, prices=None, created=None):
+		self.prices = prices if prices is not None else {}
+		self.created = created if created is not None else time.time()
+		self._cheapest = {}
+
+	def __len__(self):
+		return len(self.prices)
+
+	def __contains__(self, name):
+		return name in self.prices
+
+	def add_rows(self, name, rows):
+		"""
+		Add a card from the price api's rows for it, replacing whatever the snapshot had for it.
+		:param name: the card name
+		:type name: str
+		:param rows: the print runs, as returned by yugiohprices.fetch_price_rows
+		:type rows: list of dict
+		"""
+		runs = []
+		for run in rows:
+			summary = None
+			price_data = run.get('price_data') or {}
+			if price_data.get('status') == 'success':
+				summary = dict(price_data['data']['prices'])
+			runs.append((run['print_tag'], run['rarity'], summary))
+		self.prices[name] = runs
+		self._cheapest.pop(name, None)
+
+	def price_rows(self, card):
+		"""
+		:returns: the print runs of a card in the shape of the price api's rows. Empty for a card the snapshot does not have.
+		:rtype: list of dict
+		"""
+		rows = []
+		for (print_tag, rarity, summary) in self.prices.get(card.name, ()):
+			if summary is None:
+				price_data = {'status': 'fail'}
+			else:
+				price_data = {'status': 'success', 'data': {'prices': summary, 'listings': []}}
+			rows.append({'print_tag': print_tag, 'rarity': rarity, 'price_data': price_data})
+		return rows
+
+	def price_data(self, card):
+		"""
+		The offline equivalent of yugiohprices.get_price_data.
+		:rtype: list of yugiohprices.PrintedCard
+		"""
+		return yugiohprices.printed_cards(card, self.price_rows(card))
+
+	def price_data_many(self, cards):
+		"""
+		The offline equivalent of yugiohprices.get_price_data_many.
+		:rtype: list of lists of yugiohprices.PrintedCard
+		"""
+		return [self.price_data(card) for card in cards]
+
+	def cheapest_price(self, card):
+		"""
+		The same as yugiohprices.get_cheapest_price(self.price_data(card)), remembered per card name.
+		:rtype: float or None
+		"""
+		if card.name not in self._cheapest:
+			self._cheapest[card.name] = yugiohprices.get_cheapest_price(self.price_data(card))
+		return self._cheapest[card.name]
+
+	def save(self, path):
+		"""
+		Write the snapshot to a file.
+		:param path: the snapshot file
+		:type path: str
+		"""
+		data = pickle.dumps((SNAPSHOT_VERSION, self.created, self.prices), pickle.HIGHEST_PROTOCOL)
+		with open(path, 'wb') as fl:
+			fl.write(data)
+
+	@classmethod
+	def load(cls, path):
+		"""
+		Read a snapshot written by save, in one read.
+		:param path: the snapshot file
+		:type path: str
+		:rtype: PriceSnapshot
+		:raises IOError: if the file is not a snapshot this version can read
+		"""
+		with open(path, 'rb') as fl:
+			data = fl.read()
+		try:
+			version, created, prices = pickle.loads(data)
+		except (EOFError, ValueError, TypeError, pickle.UnpicklingError):
+			raise IOError('{0} is not a price snapshot'.format(path))
+		if version != SNAPSHOT_VERSION:
+			raise IOError('{0} is a version {1} price snapshot, expected version {2}'.format(path, version, SNAPSHOT_VERSION))
+		return cls(prices, created)
+
+	@classmethod
+	def import_responses(cls, paths):
+		"""
+		Build a snapshot from dumps of price api responses.
+
+		Every file holds either one json document or one document per line. A document is a response of the get_card_prices api, a list of them, or an object {"name": card name, "response": response}. Without the wrapper, the card name is taken from the "name" field of the response's rows. Later responses for a card replace earlier ones.
+		:param paths: the dump files
+		:type paths: iterable of str
+		:rtype: PriceSnapshot
+		"""
+		snapshot = cls()
+		for path in paths:
+			for document in _documents(path):
+				snapshot._import(document)
+		return snapshot
+
+	def _import(self, document):
+		if isinstance(document, list):
+			for item in document:
+				self._import(item)
+			return
+		name = None
+		response = document
+		if 'response' in document:
+			name = document.get('name')
+			response = document['response']
+		if response.get('status') != 'success':
+			# a card the api has nothing for, which is only worth keeping if we know its name
+			if name is not None:
+				self.add_rows(name, [])
+			return
+		rows = response['data']
+		by_name = {}
+		for row in rows:
+			by_name.setdefault(name or row.get('name'), []).append(row)
+		for (row_name, named_rows) in by_name.items():
+			if row_name is None:
+				raise ValueError('Price response rows without a card name')
+			self.add_rows(row_name, named_rows)
+
+	@classmethod
+	def import_price_cache(cls, path):
+		"""
+		Build a snapshot from every card in a pricecache database.
+		:param path: the pricecache sqlite file
+		:type path: str
+		:rtype: PriceSnapshot
+		"""
+		snapshot = cls()
+		connection = sqlite3.connect(path)
+		try:
+			for (name, rows) in connection.execute('SELECT name, rows FROM prices'):
+				snapshot.add_rows(name, json.loads(rows))
+		finally:
+			connection.close()
+		return snapshot
+
+def _documents(path):
+	with open(path, 'rb') as fl:
+		text = fl.read().decode('utf-8')
+	try:
+		yield json.loads(text)
+		return
+	except ValueError:
+		pass
+	# not one document, so one per line
+	for line in text.splitlines():
+		line = line.strip()
+		if line:
+			yield json.loads(line)
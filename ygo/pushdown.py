@@ -0,0 +1,167 @@
+"""
+Translates compiled yql queries into sqlite WHERE clauses over the ygopro cards.cdb tables, so the database only hands back the rows that can match.
+
+Only part of a query has to be understood. compile_where splits the top level "and" chain of a query, translates every piece it can, and returns whatever is left as a residual YQuery to run over the rows that come back. ::
+
+	where, params, residual = compile_where(yql.compile_yql('monster and attack > 2000'), ygopro.MONSTER_TYPE, ygopro.ATTRIBUTE)
+
+Every column expression is NULL where the matching card field is None (a spell has no attack), so comparisons against them fail just like the python evaluation does.
+"""
+import re
+
+from . import yql
+
+IS_MONSTER = '(datas.type & 1)'
+
+# sql expressions equal to the decoded fields of a card
+NUMERIC_COLUMNS = {
+	'attack': 'CASE WHEN {0} THEN datas.atk END'.format(IS_MONSTER),
+	'defense': 'CASE WHEN {0} THEN datas.def END'.format(IS_MONSTER),
+	'level': 'CASE WHEN {0} = 0 THEN NULL WHEN datas.level < 14 THEN datas.level ELSE datas.level & 15 END'.format(IS_MONSTER),
+	'scale': 'CASE WHEN {0} AND datas.level >= 14 THEN (datas.level >> 24) & 15 END'.format(IS_MONSTER),
+}
+
+TEXT_COLUMNS = {
+	'name': 'texts.name',
+	'text': 'texts.desc',
+}
+
+# fields stored as a code, decoded through a lookup table
+CODED_COLUMNS = {
+	'type': 'datas.race',
+	'attribute': 'datas.attribute',
+}
+
+COMPARATORS = {
+	yql.Equal: '=',
+	yql.LessThan: '<',
+	yql.GreaterThan: '>',
+}
+
+FLIPPED = {
+	yql.Equal: yql.Equal,
+	yql.LessThan: yql.GreaterThan,
+	yql.GreaterThan: yql.LessThan,
+}
+
+def regexp(pattern, value):
+	"""The sqlite REGEXP function. "X REGEXP Y" calls regexp(Y, X)."""
+	if value is None:
+		return False
+	return yql.compile_pattern(pattern)(value)
+
+def compile_where(expr, monster_types, attributes):
+	"""
+	Split a compiled query into a WHERE clause and a residual query.
+	:param expr: the query to translate
+	:type expr: yql.YQuery
+	:param monster_types: the database's race codes, as code to type name
+	:type monster_types: dict
+	:param attributes: the database's attribute codes, as code to attribute name
+	:type attributes: dict
+	:returns: (where, params, residual). where is None if nothing could be translated, and residual is None if everything was.
+	:rtype: tuple of (str or None, list, yql.YQuery or None)
+	"""
+	compiler = _Compiler({'type': monster_types, 'attribute': attributes})
+	clauses = []
+	params = []
+	residual = []
+	for term in _conjuncts(expr):
+		result = compiler.translate(term)
+		if result is None:
+			residual.append(term)
+		else:
+			clauses.append(result[0])
+			params.extend(result[1])
+
+	where = ' AND '.join(clauses) if clauses else None
+	rest = None
+	for term in residual:
+		rest = term if rest is None else yql.And(rest, term)
+	return (where, params, rest)
+
+def _conjuncts(expr):
+	if isinstance(expr, yql.And):
+		for term in _conjuncts(expr.a):
+			yield term
+		for term in _conjuncts(expr.b):
+			yield term
+	else:
+		yield expr
+
+def _constant(value):
+	return ('1' if value else '0', [])
+
+class _Compiler(object):
+	def __init__(self, code_tables):
+		self.code_tables = code_tables
+
+	def translate(self, node):
+		# returns (sql, params), or None if the node cannot be translated
+		if isinstance(node, yql.CategoryVariable):
+			if node.bit is None:
+				return None
+			return ('(datas.type & ?) != 0', [node.bit])
+		elif isinstance(node, yql.And) or isinstance(node, yql.Or):
+			left = self.translate(node.a)
+			right = self.translate(node.b)
+			if left is None or right is None:
+				return None
+			op = 'AND' if isinstance(node, yql.And) else 'OR'
+			return ('({0} {1} {2})'.format(left[0], op, right[0]), left[1] + right[1])
+		elif isinstance(node, yql.Binary):
+			return self.compare(type(node), node.a, node.b)
+		else:
+			return None
+
+	def compare(self, op, a, b):
+		if _is_literal(a) and _is_literal(b):
+			# nothing depends on the card, so work it out now
+			return _constant(op(a, b)(None))
+
+		if _is_literal(a) and _is_variable(b) and op in FLIPPED:
+			op, a, b = FLIPPED[op], b, a
+		if not _is_variable(a) or not _is_literal(b):
+			return None
+
+		if isinstance(a, yql.CategoryVariable):
+			if not isinstance(b.value, int):
+				return _constant(False)
+			comparator = '=' if op is yql.Match else COMPARATORS[op]
+			return ('((datas.type & ?) != 0) {0} ?'.format(comparator), [a.bit, b.value])
+
+		key = a.value
+		value = b.value
+		if key in NUMERIC_COLUMNS:
+			if not isinstance(value, int):
+				# a number never equals, matches or orders against a string
+				return _constant(False)
+			comparator = '=' if op is yql.Match else COMPARATORS[op]
+			return ('({0}) {1} ?'.format(NUMERIC_COLUMNS[key], comparator), [value])
+		elif key in TEXT_COLUMNS:
+			if not isinstance(value, str):
+				return None
+			if op is yql.Equal:
+				return ('{0} = ?'.format(TEXT_COLUMNS[key]), [value])
+			elif op is yql.Match:
+				return ('{0} REGEXP ?'.format(TEXT_COLUMNS[key]), [value])
+			return None
+		elif key in CODED_COLUMNS:
+			if not isinstance(value, str) or op not in (yql.Equal, yql.Match):
+				return None
+			if op is yql.Equal:
+				codes = [code for (code, name) in self.code_tables[key].items() if name == value]
+			else:
+				codes = [code for (code, name) in self.code_tables[key].items()
+					if name is not None and re.search(value, name)]
+			if len(codes) == 0:
+				return _constant(False)
+			sql = '({0} AND {1} IN ({2}))'.format(IS_MONSTER, CODED_COLUMNS[key], ', '.join('?' * len(codes)))
+			return (sql, sorted(codes))
+		return None
+
+def _is_variable(node):
+	return isinstance(node, yql.KeyVariable) or (isinstance(node, yql.CategoryVariable) and node.bit is not None)
+
+def _is_literal(node):
+	return isinstance(node, yql.Integer) or isinstance(node, yql.String)
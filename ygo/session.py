@@ -15,6 +15,9 @@ from . import yql
 
 # for getting price information
 from . import yugiohprices
+from . import pricecache
+from . import pricesnapshot
+from . import valuation
 
 def _get_module(fmt):
 	if fmt.endswith('ydk'):
@@ -25,13 +28,30 @@ def _get_module(fmt):
 		return decklist.text
 
 class Session(object):
-	def __init__(self, ygopro_path):
+	def __init__(self, ygopro_path, catalog=False, text_index=False, cache=False, price_cache=False, price_snapshot=None):
 		"""
 		Create a Session object.
 		:param ygopro_path: the path to the directory your YGOPro is installed in. If your install is broken up into multiple pieces, choose the one containing cards.cdb.
+		:param catalog: If True, read the whole card database into memory once, and serve every card lookup from there. Useful for batch jobs that open many decks.
+		:type catalog: bool
+		:param text_index: If True (and catalog is True), narrow yql name and text matches down with an inverted index, kept next to cards.cdb.
+		:type text_index: bool
+		:param cache: If True, keep a snapshot of the decoded card database next to cards.cdb, and fill the catalog from it while cards.cdb is unchanged. A path puts the snapshot there instead. Implies catalog.
+		:type cache: bool or str
+		:param price_cache: If True, cache card prices for a day in prices.sqlite, in the ygopro directory. A path puts the cache there instead, and a PriceCache is used as it is.
+		:type price_cache: bool, str or ygo.pricecache.PriceCache
+		:param price_snapshot: If given, the path of a ygo.pricesnapshot file. Prices are then only ever read from the snapshot, never fetched.
+		:type price_snapshot: str
 		"""
 		self.path = ygopro_path
+		self.catalog = catalog
+		self.text_index = text_index
+		self.cache = cache
+		self.price_cache = price_cache
 		self.db = None
+		self.prices = None
+		self.price_snapshot = price_snapshot
+		self.snapshot = None
 
 	def __enter__(self):
 		self.open()
@@ -47,7 +67,11 @@ class Session(object):
 		"""
 		if self.db == None:
 			db_path = os.path.join(self.path, 'cards.cdb')
-			self.db = ygopro.YGOProDatabase(db_path)
+			if self.cache is True:
+				cache_path = db_path + '.cache'
+			else:
+				cache_path = self.cache or None
+			self.db = ygopro.YGOProDatabase(db_path, catalog=self.catalog, text_index=self.text_index, cache_path=cache_path)
 		return self
 
 	def close(self):
@@ -57,6 +81,41 @@ class Session(object):
 		if self.db != None:
 			self.db.close()
 			self.db = None
+		if self.prices != None:
+			self.prices.close()
+			self.prices = None
+
+	def get_price_snapshot(self):
+		"""
+		Get the price snapshot, loading it the first time. None if the session has no snapshot.
+		:rtype: ygo.pricesnapshot.PriceSnapshot
+		"""
+		if self.snapshot == None and self.price_snapshot:
+			self.snapshot = pricesnapshot.PriceSnapshot.load(self.price_snapshot)
+		return self.snapshot
+
+	def _price_source(self):
+		# the snapshot, the cache, or None to ask the api directly
+		snapshot = self.get_price_snapshot()
+		if snapshot is not None:
+			return snapshot
+		return self.get_price_cache()
+
+	def get_price_cache(self):
+		"""
+		Get the price cache, opening it the first time. None if the session does not cache prices.
+		:rtype: ygo.pricecache.PriceCache
+		"""
+		if self.prices == None and self.price_cache:
+			if isinstance(self.price_cache, pricecache.PriceCache):
+				self.prices = self.price_cache
+			else:
+				if self.price_cache is True:
+					path = os.path.join(self.path, 'prices.sqlite')
+				else:
+					path = self.price_cache
+				self.prices = pricecache.PriceCache(path)
+		return self.prices
 
 	def get_database(self):
 		"""
@@ -100,6 +159,22 @@ class Session(object):
 		if path != None:
 			return mod.open_deck(path, source)
 
+	def ingest(self, target, processes=None, pattern='*.ydk'):
+		"""
+		Read every .ydk deck in a directory, tar archive or glob, lazily. Files are parsed across a pool of processes, and every card is looked up in the in-memory catalog of the database, which is loaded first if it is not already.
+		:param target: a directory, a tar archive, or a glob pattern
+		:type target: str
+		:param processes: the number of worker processes, the number of cpus by default
+		:type processes: int
+		:param pattern: the file names to pick up in a directory or archive
+		:type pattern: str
+		:return: one result per file, holding either the deck or an error message
+		:rtype: iterator of ygo.deck.ingest.IngestResult
+		"""
+		source = self.get_database()
+		source.load_catalog()
+		return decklist.ingest.ingest(target, source, processes, pattern)
+
 	def load(self, text, fmt=None):
 		"""
 		Load a deck from a string.
@@ -162,6 +237,24 @@ class Session(object):
 		"""
 		return self.get_database().find_id(cid)
 
+	def find_names(self, names):
+		"""
+		Get many cards by name with a single database query.
+		:param names: The cards' names.
+		:type names: iterable of str
+		:return: dict of name to YugiohCard
+		"""
+		return self.get_database().find_names(names)
+
+	def find_ids(self, cids):
+		"""
+		Get many cards by id with a single database query.
+		:param cids: The cards' ids.
+		:type cids: iterable of str or int
+		:return: dict of str id to YugiohCard
+		"""
+		return self.get_database().find_ids(cids)
+
 	def all_cards(self):
 		"""
 		Get all cards in the database.
@@ -174,24 +267,40 @@ class Session(object):
 		Perform a yql filter on the given cardset.
 		:param query: The yql query to compile.
 		:type query: str
-		:param cardset: A sequence of cards to filter. If not given, use all_cards().
+		:param cardset: A sequence of cards to filter. If not given, search the whole database. In catalog mode this uses the vectorized columnar backend when numpy is available.
 		:type cardset: default None, or iterable of YugiohCard
 		:return: an iterable of YugiohCard
 		"""
-		cardset = cardset or self.all_cards()
 		expr = yql.compile_yql(query)
-		return expr.filter(cardset)
+		if cardset is not None:
+			return expr.filter(cardset)
+		return self.get_database().select(expr)
 
 	def price_data(self, card):
 		"""
 		Get the average price of the cheapest version of the card. Uses the public api for the incredible yugiohprices.com price aggregator.
 		:param card: The card you want to know the price of.
 		:type card: YugiohCard
-		:return: a list of PrintedCard objects containing information about each print run of the given card.
-		:rtype: list of ygo.prices.PrintedCard
+		:return: a set of PrintedCard objects containing information about each print run of the given card.
+		:rtype: YugiohSet of ygo.prices.PrintedCard
 		"""
-		cards = yugiohprices.get_price_data(card)
-		return decklist.YugiohSet(cards)
+		prices = self._price_source()
+		if prices is not None:
+			return decklist.YugiohSet(prices.price_data(card))
+		return decklist.YugiohSet(yugiohprices.get_price_data(card))
+
+	def price_data_many(self, cards):
+		"""
+		Get the price data of many cards at once. The requests are made concurrently, see ygo.prices.get_price_data_many.
+		:param cards: The cards you want to know the prices of.
+		:type cards: iterable of YugiohCard
+		:return: a list of PrintedCard objects for each card, in the same order as cards.
+		:rtype: list of lists of ygo.prices.PrintedCard
+		"""
+		prices = self._price_source()
+		if prices is not None:
+			return prices.price_data_many(cards)
+		return yugiohprices.get_price_data_many(cards)
 
 	def get_price(self, card):
 		"""
@@ -201,7 +310,21 @@ class Session(object):
 		:return: the price of the card
 		:rtype: float
 		"""
-		cards = yugiohprices.get_price_data(card)
-		return yugiohprices.get_cheapest_price(cards)
+		snapshot = self.get_price_snapshot()
+		if snapshot is not None:
+			return snapshot.cheapest_price(card)
+		return yugiohprices.get_cheapest_price(self.price_data(card))
 		
 		
+
+	def value_decks(self, decks):
+		"""
+		Price a batch of decks at once, such as every deck of a tournament, from the session's price snapshot.
+		:param decks: the decks, by name
+		:type decks: dict or list of YugiohDeck
+		:rtype: ygo.valuation.Valuation
+		"""
+		snapshot = self.get_price_snapshot()
+		if snapshot is None:
+			raise RuntimeError('Deck valuation needs a price snapshot')
+		return valuation.value_decks(decks, snapshot)
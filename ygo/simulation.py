@@ -0,0 +1,294 @@
+"""
+Simulates the first turns of many games at once, to find the chance of reaching a consistency goal by each turn when the deck has cards that draw, search, or send other cards to the graveyard.
+
+Example: ::
+
+	sim = Simulation(deck)
+	sim.add_effect(pot_of_greed, Draw(2))
+	sim.add_effect('name "Reinforcement of the Army"', Search('monster and level < 5'))
+	curves = sim.run({'boss': Cardset([boss]) > Number(0)}, turns=4, games=200000)
+	print(curves.by['boss'])
+
+Every copy in the main deck has a zone (deck, hand or graveyard) in each game, and the deck order is a random key per copy, so a batch of games is just two numpy arrays and every step of a turn is applied to all of them together. A turn draws a card (except the first turn of the player going first), then activates the effects of the cards in hand until none are left to activate, then checks the goals against the cards in hand. An activated card goes to the graveyard, and each copy activates at most once a turn, even if an effect returns it to the hand.
+"""
+import copy
+import multiprocessing
+
+NUMPY_EXISTS = True
+try:
+	import numpy
+except ImportError:
+	NUMPY_EXISTS = False
+
+from . import yql
+from . import consistency
+from .card import YugiohCard
+
+DECK = 0
+HAND = 1
+GRAVEYARD = 2
+
+ZONES = {'deck': DECK, 'hand': HAND, 'graveyard': GRAVEYARD}
+
+BATCH_SIZE = 10000
+
+class Effect(object):
+	"""A declarative card effect."""
+	def bind(self, cards):
+		"""
+		:param cards: every copy in the deck, in encoding order
+		:type cards: list of YugiohCard
+		:returns: the effect, ready to apply to games of that deck
+		:rtype: Effect
+		"""
+		return self
+
+	def apply(self, games, active):
+		"""
+		Resolve the effect.
+		:param games: the batch of games
+		:type games: Games
+		:param active: which games activated the effect
+		:type active: numpy.ndarray of bool
+		"""
+		raise NotImplementedError()
+
+class Draw(Effect):
+	"""Draw cards from the top of the deck."""
+	def __init__(self, count=1):
+		self.count = count
+	def apply(self, games, active):
+		games.draw(active, self.count)
+	def __repr__(self):
+		return 'Draw({})'.format(self.count)
+
+class Move(Effect):
+	"""Move a random card matching a yql query from one zone to another."""
+	def __init__(self, query, source='deck', destination='hand', count=1):
+		self.query = query
+		self.source = ZONES[source]
+		self.destination = ZONES[destination]
+		self.count = count
+		self.matches = None
+	def bind(self, cards):
+		expr = yql.compile_yql(self.query)
+		bound = copy.copy(self)
+		bound.matches = numpy.array([bool(expr(card)) for card in cards], dtype=bool)
+		return bound
+	def apply(self, games, active):
+		for i in range(self.count):
+			games.move(active, self.matches, self.source, self.destination)
+	def __repr__(self):
+		return '{}({!r})'.format(self.__class__.__name__, self.query)
+
+class Search(Move):
+	"""Add a card matching a yql query from the deck to the hand."""
+	def __init__(self, query, count=1):
+		Move.__init__(self, query, 'deck', 'hand', count)
+
+class SendToGraveyard(Move):
+	"""Send a card matching a yql query to the graveyard, from the deck unless told otherwise."""
+	def __init__(self, query, source='deck', count=1):
+		Move.__init__(self, query, source, 'graveyard', count)
+
+class Games(object):
+	"""The state of a batch of games.
+
+	:ivar zone: the zone of every copy in every game
+	:vartype zone: numpy.ndarray of int8, games by copies
+	:ivar order: the position of every copy in the shuffled deck, lowest on top
+	:vartype order: numpy.ndarray of float64, games by copies"""
+	def __init__(self, count, size, random):
+		self.random = random
+		self.rows = numpy.arange(count)
+		self.zone = numpy.full((count, size), DECK, dtype=numpy.int8)
+		self.order = random.random((count, size))
+
+	def draw(self, active, count=1):
+		for i in range(count):
+			keys = numpy.where(self.zone == DECK, self.order, numpy.inf)
+			top = numpy.argmin(keys, axis=1)
+			# a game with an empty deck has nothing to draw
+			drawn = active & numpy.isfinite(keys[self.rows, top])
+			self.zone[self.rows[drawn], top[drawn]] = HAND
+
+	def move(self, active, matches, source, destination):
+		candidates = (self.zone == source) & matches & active[:, None]
+		keys = numpy.where(candidates, self.random.random(self.zone.shape), -1.0)
+		chosen = numpy.argmax(keys, axis=1)
+		moved = candidates[self.rows, chosen]
+		self.zone[self.rows[moved], chosen[moved]] = destination
+
+	def in_zone(self, zone=HAND):
+		return self.zone == zone
+
+class Curves(object):
+	"""Per turn probabilities of every goal.
+
+	:ivar at: for every goal, the chance it holds at the end of each turn
+	:vartype at: dict of list of float
+	:ivar by: for every goal, the chance it has held at the end of any turn up to each turn
+	:vartype by: dict of list of float
+	:ivar games: the number of games simulated
+	:vartype games: int"""
+	def __init__(self, at_counts, by_counts, games):
+		self.games = games
+		self.at = dict((name, [float(x) / games for x in counts]) for (name, counts) in at_counts.items())
+		self.by = dict((name, [float(x) / games for x in counts]) for (name, counts) in by_counts.items())
+
+	def __repr__(self):
+		return 'Curves({}, {} games)'.format(self.by, self.games)
+
+class Simulation(object):
+	"""A deck and the effects of its cards.
+
+	:ivar cards: every copy in the main deck, in encoding order
+	:vartype cards: list of YugiohCard"""
+	def __init__(self, deck, seed=None):
+		if not NUMPY_EXISTS:
+			raise ImportError("No module named 'numpy'")
+		self.cards = list(consistency._main_deck(deck).values())
+		self.seed = seed
+		self.effects = []
+
+	def add_effect(self, cards, *effects):
+		"""
+		Give cards effects, activated in the order given whenever one of the cards is in hand.
+		:param cards: a card, or a yql query matching the cards
+		:type cards: YugiohCard or str
+		:param effects: what happens when the card is activated
+		:type effects: Effect
+		"""
+		if isinstance(cards, YugiohCard):
+			owners = numpy.array([card == cards for card in self.cards], dtype=bool)
+		else:
+			expr = yql.compile_yql(cards)
+			owners = numpy.array([bool(expr(card)) for card in self.cards], dtype=bool)
+		self.effects.append((owners, [effect.bind(self.cards) for effect in effects]))
+
+	def _goals(self, goals):
+		encoded = []
+		for (name, expr) in goals.items():
+			cardsets = []
+			for cardset in expr.cardsets():
+				if len(cardset) > 0 and cardset not in cardsets:
+					cardsets.append(cardset)
+			membership = numpy.array(
+				[[card in cardset for card in self.cards] for cardset in cardsets],
+				dtype=numpy.int64).reshape(len(cardsets), len(self.cards))
+			encoded.append((name, expr, cardsets, membership))
+		return encoded
+
+	def play(self, goals, turns, count, going_first=True, random=None):
+		"""
+		Play one batch of games.
+		:param goals: the goals, by name
+		:type goals: dict of consistency.AST
+		:param turns: the number of turns to play
+		:type turns: int
+		:param count: the number of games
+		:type count: int
+		:param going_first: skip the draw of the first turn, and open with 5 cards. Otherwise the first turn draws a sixth card.
+		:type going_first: bool
+		:returns: (at, by), the number of games meeting each goal at and by each turn
+		:rtype: tuple of dict
+		"""
+		if random is None:
+			random = numpy.random.default_rng(self.seed)
+		encoded = self._goals(goals)
+		games = Games(count, len(self.cards), random)
+		everyone = numpy.ones(count, dtype=bool)
+		games.draw(everyone, 5)
+
+		at = dict((name, []) for (name, expr, cardsets, membership) in encoded)
+		by = dict((name, []) for (name, expr, cardsets, membership) in encoded)
+		reached = dict((name, numpy.zeros(count, dtype=bool)) for (name, expr, cardsets, membership) in encoded)
+		for turn in range(turns):
+			if turn > 0 or not going_first:
+				games.draw(everyone)
+			self._activate(games)
+
+			hand = games.in_zone(HAND)
+			hand_size = hand.sum(axis=1)
+			for (name, expr, cardsets, membership) in encoded:
+				held = membership.dot(hand.T)
+				passed = expr.evaluate(dict(zip(cardsets, held)), hand_size)
+				passed = numpy.broadcast_to(numpy.asarray(passed, dtype=bool), (count,))
+				reached[name] = reached[name] | passed
+				at[name].append(int(numpy.count_nonzero(passed)))
+				by[name].append(int(numpy.count_nonzero(reached[name])))
+		return (at, by)
+
+	def _activate(self, games):
+		# activate one copy of every card with effects in every game that holds one, until no game holds any that has not activated this turn
+		used = numpy.zeros(games.zone.shape, dtype=bool)
+		while True:
+			activated = False
+			for (owners, effects) in self.effects:
+				holding = games.in_zone(HAND) & owners & ~used
+				active = holding.any(axis=1)
+				if not active.any():
+					continue
+				activated = True
+				chosen = numpy.argmax(holding, axis=1)
+				games.zone[games.rows[active], chosen[active]] = GRAVEYARD
+				used[games.rows[active], chosen[active]] = True
+				for effect in effects:
+					effect.apply(games, active)
+			if not activated:
+				return
+
+	def run(self, goals, turns=5, games=100000, going_first=True, processes=None, batch_size=BATCH_SIZE):
+		"""
+		Simulate games in batches, spread across a pool of processes.
+		:param goals: the goals, by name
+		:type goals: dict of consistency.AST
+		:param turns: the number of turns to play
+		:type turns: int
+		:param games: the number of games
+		:type games: int
+		:param going_first: skip the draw of the first turn
+		:type going_first: bool
+		:param processes: the number of worker processes, the number of cpus by default. With 1, everything runs in this process.
+		:type processes: int
+		:param batch_size: the number of games played at once
+		:type batch_size: int
+		:rtype: Curves
+		"""
+		sizes = [min(batch_size, games - start) for start in range(0, games, batch_size)]
+		seeds = numpy.random.SeedSequence(self.seed).spawn(len(sizes))
+		tasks = [(size, seed) for (size, seed) in zip(sizes, seeds)]
+
+		if processes is None:
+			processes = multiprocessing.cpu_count()
+		processes = max(1, min(processes, len(tasks)))
+		if processes == 1:
+			_init_worker(self, goals, turns, going_first)
+			results = [_play_batch(task) for task in tasks]
+		else:
+			pool = multiprocessing.Pool(processes, _init_worker, (self, goals, turns, going_first))
+			try:
+				results = list(pool.imap_unordered(_play_batch, tasks))
+			finally:
+				pool.close()
+				pool.join()
+
+		at = dict((name, [0] * turns) for name in goals)
+		by = dict((name, [0] * turns) for name in goals)
+		for (batch_at, batch_by) in results:
+			for name in goals:
+				at[name] = [x + y for (x, y) in zip(at[name], batch_at[name])]
+				by[name] = [x + y for (x, y) in zip(by[name], batch_by[name])]
+		return Curves(at, by, games)
+
+# the simulation shared with every worker process, set by _init_worker
+_WORK = None
+
+def _init_worker(simulation, goals, turns, going_first):
+	global _WORK
+	_WORK = (simulation, goals, turns, going_first)
+
+def _play_batch(task):
+	(count, seed) = task
+	(simulation, goals, turns, going_first) = _WORK
+	return simulation.play(goals, turns, count, going_first, numpy.random.default_rng(seed))
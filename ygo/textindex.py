@@ -0,0 +1,167 @@
+"""
+An inverted index over the words of card names and card text, used to narrow down which cards a yql name or text match can possibly apply to before running the real match on them.
+
+Words are runs of lowercase letters and digits. A plain substring pattern is split the same way: a word of the pattern with something other than a letter or digit on both sides has to be a whole word of the card, while the words at the ends of the pattern only have to be the end or the start of one. The index is case-insensitive and the real match is not, so the candidates are always a superset of the actual matches.
+
+Example: ::
+
+	index = TextIndex.build(session.all_cards())
+	index.candidates('text', 'Darklord')
+"""
+import re
+import bisect
+import pickle
+from array import array
+
+from . import yql
+
+INDEX_VERSION = 1
+
+WORD = re.compile(r'[a-z0-9]+')
+
+FIELDS = ['name', 'text']
+
+def tokenize(text):
+	"""
+	:returns: the lowercase words of a string
+	:rtype: list of str
+	"""
+	return WORD.findall(text.lower())
+
+class TextIndex(object):
+	"""Maps every word of every card's name and text to the ids of the cards that contain it.
+
+	:ivar fingerprint: identifies the database the index was built from, see ygopro.database_fingerprint
+	:vartype fingerprint: tuple"""
+	def __init__(self, postings, fingerprint=None):
+		self.postings = postings
+		self.fingerprint = fingerprint
+		self._vocabulary = dict((field, sorted(words)) for (field, words) in postings.items())
+
+	@classmethod
+	def build(cls, cards, fingerprint=None):
+		"""
+		Index a set of cards.
+		:param cards: the cards to index
+		:type cards: iterable of YugiohCard
+		:param fingerprint: identifies where the cards came from
+		:rtype: TextIndex
+		"""
+		words = dict((field, {}) for field in FIELDS)
+		for card in cards:
+			cid = int(card.id)
+			for field in FIELDS:
+				value = card[field]
+				if value is None:
+					continue
+				postings = words[field]
+				for word in set(tokenize(value)):
+					postings.setdefault(word, []).append(cid)
+		postings = {}
+		for (field, index) in words.items():
+			postings[field] = dict((word, array('l', sorted(ids))) for (word, ids) in index.items())
+		return cls(postings, fingerprint)
+
+	@classmethod
+	def load(cls, path, fingerprint=None):
+		"""
+		Read an index written by save.
+		:param path: the index file
+		:type path: str
+		:param fingerprint: if given, the index is only used if it was built from a database with this fingerprint
+		:returns: the index, or None if the file is missing, unreadable or out of date
+		:rtype: TextIndex or None
+		"""
+		try:
+			with open(path, 'rb') as fl:
+				version, saved_fingerprint, postings = pickle.load(fl)
+		except (IOError, OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+			return None
+		if version != INDEX_VERSION:
+			return None
+		if fingerprint is not None and saved_fingerprint != fingerprint:
+			return None
+		return cls(postings, saved_fingerprint)
+
+	def save(self, path):
+		"""
+		Write the index to a file.
+		:param path: the index file
+		:type path: str
+		"""
+		with open(path, 'wb') as fl:
+			pickle.dump((INDEX_VERSION, self.fingerprint, self.postings), fl, pickle.HIGHEST_PROTOCOL)
+
+	def candidates(self, field, pattern):
+		"""
+		Find every card whose field could contain a plain substring.
+		:param field: 'name' or 'text'
+		:type field: str
+		:param pattern: the substring
+		:type pattern: str
+		:returns: the ids of the cards that may contain the substring, or None if the index cannot tell
+		:rtype: set of int or None
+		"""
+		lowered = pattern.lower()
+		result = None
+		for match in WORD.finditer(lowered):
+			word = match.group(0)
+			whole_start = match.start() > 0
+			whole_end = match.end() < len(lowered)
+			ids = set()
+			for token in self._tokens(field, word, whole_start, whole_end):
+				ids.update(self.postings[field][token])
+			result = ids if result is None else result & ids
+			if not result:
+				break
+		return result
+
+	def _tokens(self, field, word, whole_start, whole_end):
+		# every indexed word that the fragment of the pattern can be part of
+		if whole_start and whole_end:
+			if word in self.postings[field]:
+				return [word]
+			return []
+		vocabulary = self._vocabulary[field]
+		if whole_start:
+			start = bisect.bisect_left(vocabulary, word)
+			end = start
+			while end < len(vocabulary) and vocabulary[end].startswith(word):
+				end += 1
+			return vocabulary[start:end]
+		elif whole_end:
+			return [token for token in vocabulary if token.endswith(word)]
+		else:
+			return [token for token in vocabulary if word in token]
+
+	def narrow(self, expr):
+		"""
+		Find the cards a compiled query can possibly match, from its name and text matches.
+		:param expr: the query
+		:type expr: yql.YQuery
+		:returns: the ids of every card that may match, or None if the index cannot narrow the query down
+		:rtype: set of int or None
+		"""
+		if isinstance(expr, yql.And):
+			left = self.narrow(expr.a)
+			right = self.narrow(expr.b)
+			if left is None:
+				return right
+			elif right is None:
+				return left
+			return left & right
+		elif isinstance(expr, yql.Or):
+			left = self.narrow(expr.a)
+			right = self.narrow(expr.b)
+			if left is None or right is None:
+				return None
+			return left | right
+		elif isinstance(expr, yql.Match) or isinstance(expr, yql.Equal):
+			if not isinstance(expr.a, yql.KeyVariable) or expr.a.value not in FIELDS:
+				return None
+			if not isinstance(expr.b, yql.String):
+				return None
+			if isinstance(expr, yql.Match) and not yql.REGEX_CHARS.isdisjoint(expr.b.value):
+				return None
+			return self.candidates(expr.a.value, expr.b.value)
+		return None
@@ -0,0 +1,159 @@
+"""
+Prices many decks at once from a price snapshot, with numpy.
+
+Every card is priced three ways from the averages of its print runs: the cheapest print, the median print, and a rarity-weighted mean where each print counts rarity_score + 1 times, so rarer prints pull the price towards themselves. The prints of every card are flattened into arrays and reduced per card, the copies of every deck are flattened into (deck, section, card, count) arrays, and each deck total is a single weighted bincount. ::
+
+	snapshot = PriceSnapshot.load('prices.snapshot')
+	values = value_decks(decks, snapshot)
+	for row in values.rows('cheapest'):
+		print(row.deck, row.total)
+"""
+import collections
+
+NUMPY_EXISTS = True
+try:
+	import numpy
+except ImportError:
+	NUMPY_EXISTS = False
+
+from .yugiohprices import rarity_score
+
+SECTIONS = ['main', 'extra', 'side']
+
+METHODS = ['cheapest', 'median', 'weighted']
+
+DeckValue = collections.namedtuple('DeckValue', ['deck', 'main', 'extra', 'side', 'total', 'unpriced'])
+
+def card_prices(snapshot, names):
+	"""
+	Price every card three ways.
+	:param snapshot: the prices
+	:type snapshot: pricesnapshot.PriceSnapshot
+	:param names: the card names
+	:type names: list of str
+	:returns: an array of prices for every method in METHODS, in the order of names. NaN for a card with no priced print.
+	:rtype: dict of str to numpy.ndarray
+	"""
+	owners = []
+	averages = []
+	weights = []
+	for (i, name) in enumerate(names):
+		for (print_tag, rarity, summary) in snapshot.prices.get(name, ()):
+			if summary is None or summary.get('average') is None:
+				continue
+			owners.append(i)
+			averages.append(summary['average'])
+			weights.append(rarity_score(rarity) + 1)
+	size = len(names)
+	owners = numpy.array(owners, dtype=numpy.int64)
+	averages = numpy.array(averages, dtype=numpy.float64)
+	weights = numpy.array(weights, dtype=numpy.float64)
+	prints = numpy.bincount(owners, minlength=size)
+	priced = prints > 0
+
+	cheapest = numpy.full(size, numpy.inf)
+	numpy.minimum.at(cheapest, owners, averages)
+
+	# sort the prints by card, then by price, so every card's prints are a sorted run
+	order = numpy.lexsort((averages, owners))
+	ordered = averages[order]
+	starts = numpy.concatenate([[0], numpy.cumsum(prints)[:-1]])
+	low = starts + numpy.maximum(prints - 1, 0) // 2
+	high = starts + prints // 2
+	median = numpy.full(size, numpy.nan)
+	median[priced] = (ordered[low[priced]] + ordered[high[priced]]) / 2
+
+	weight_totals = numpy.bincount(owners, weights=weights, minlength=size)
+	weighted = numpy.full(size, numpy.nan)
+	weighted[priced] = numpy.bincount(owners, weights=averages * weights, minlength=size)[priced] / weight_totals[priced]
+
+	return {
+		'cheapest': numpy.where(priced, cheapest, numpy.nan),
+		'median': median,
+		'weighted': weighted,
+	}
+
+class Valuation(object):
+	"""The value of a batch of decks.
+
+	:ivar decks: the deck keys, in row order
+	:vartype decks: list
+	:ivar totals: for every method, an array with a row per deck and a column per section of SECTIONS
+	:vartype totals: dict of str to numpy.ndarray
+	:ivar unpriced: the number of copies without a price, per deck and section
+	:vartype unpriced: numpy.ndarray of int"""
+	def __init__(self, decks, totals, unpriced):
+		self.decks = decks
+		self.totals = totals
+		self.unpriced = unpriced
+
+	def total(self, method='cheapest'):
+		"""
+		:returns: the whole value of every deck
+		:rtype: numpy.ndarray
+		"""
+		return self.totals[method].sum(axis=1)
+
+	def rows(self, method='cheapest'):
+		"""
+		:returns: a row per deck, with the value of every section, the total, and the number of copies that had no price
+		:rtype: list of DeckValue
+		"""
+		values = self.totals[method]
+		unpriced = self.unpriced.sum(axis=1)
+		rows = []
+		for (i, key) in enumerate(self.decks):
+			sections = [float(x) for x in values[i]]
+			rows.append(DeckValue(key, sections[0], sections[1], sections[2], sum(sections), int(unpriced[i])))
+		return rows
+
+def value_decks(decks, snapshot):
+	"""
+	Value every deck of a batch with every method.
+	:param decks: the decks, by name
+	:type decks: dict or list of deck.YugiohDeck
+	:param snapshot: the prices
+	:type snapshot: pricesnapshot.PriceSnapshot
+	:rtype: Valuation
+	"""
+	if not NUMPY_EXISTS:
+		raise ImportError("No module named 'numpy'")
+	if isinstance(decks, dict):
+		keys = list(decks.keys())
+		decks = list(decks.values())
+	else:
+		decks = list(decks)
+		keys = list(range(len(decks)))
+
+	names = []
+	index = {}
+	slots = []
+	columns = []
+	counts = []
+	for (i, deck) in enumerate(decks):
+		for (s, section) in enumerate(SECTIONS):
+			for (card, count) in deck[section].items():
+				column = index.get(card.name)
+				if column is None:
+					column = index[card.name] = len(names)
+					names.append(card.name)
+				slots.append(i * len(SECTIONS) + s)
+				columns.append(column)
+				counts.append(count)
+	slots = numpy.array(slots, dtype=numpy.int64)
+	columns = numpy.array(columns, dtype=numpy.int64)
+	counts = numpy.array(counts, dtype=numpy.float64)
+	size = len(decks) * len(SECTIONS)
+	shape = (len(decks), len(SECTIONS))
+
+	prices = card_prices(snapshot, names)
+	totals = {}
+	missing = None
+	for method in METHODS:
+		price = prices[method][columns]
+		known = ~numpy.isnan(price)
+		totals[method] = numpy.bincount(slots, weights=numpy.where(known, price * counts, 0.0), minlength=size).reshape(shape)
+		if missing is None:
+			# every method prices exactly the cards that have a priced print
+			missing = numpy.bincount(slots, weights=numpy.where(known, 0.0, counts), minlength=size).reshape(shape).astype(numpy.int64)
+	return Valuation(keys, totals, missing)
@@ -1,24 +1,146 @@
+import os
+import hashlib
 import sqlite3 as sqlite
 
 from . import card
+from . import cardcache
+from . import columnar
+from . import pushdown
+from . import textindex
 
 class CardNotFoundException(RuntimeError):
 	pass
+
+class CardsNotFoundException(CardNotFoundException):
+	"""Raised by the batched lookups. missing holds every key that could not be found."""
+	def __init__(self, message, missing):
+		CardNotFoundException.__init__(self, message)
+		self.missing = missing
 	
 class InvalidQueryError(RuntimeError):
 	pass
 	
+# sqlite's default limit on host parameters in a single statement.
+# Larger batched lookups go through a temporary table instead.
+MAX_QUERY_PARAMETERS = 999
+
+def _unique(keys):
+	seen = set()
+	output = []
+	for key in keys:
+		if key not in seen:
+			seen.add(key)
+			output.append(key)
+	return output
+
+def _card_id(cid):
+	# ids are stored without leading zeros, which .ydk files often have
+	try:
+		return str(int(cid))
+	except ValueError:
+		return str(cid)
+
+def database_fingerprint(path):
+	"""
+	Identify the exact contents of a database file, so that anything derived from it can tell when it is out of date.
+	:param path: path to cards.cdb
+	:type path: str
+	:returns: the file's absolute path, size, modification time and sha1 hash
+	:rtype: tuple
+	"""
+	stat = os.stat(path)
+	sha1 = hashlib.sha1()
+	with open(path, 'rb') as fl:
+		for chunk in iter(lambda: fl.read(1 << 20), b''):
+			sha1.update(chunk)
+	return (os.path.abspath(path), stat.st_size, stat.st_mtime, sha1.hexdigest())
+
+class CardCatalog(object):
+	"""An in-memory snapshot of every card in the database, indexed by id and by name.
+
+	Every lookup is a dict hit, and always returns the same shared card instance.
+
+	:ivar text_index: if set, name and text matches in select are narrowed down with it first
+	:vartype text_index: textindex.TextIndex"""
+	def __init__(self, cards):
+		self._cards = []
+		self._by_id = {}
+		self._by_name = {}
+		self._table = None
+		self.text_index = None
+		for card in cards:
+			self._cards.append(card)
+			self._by_id[card.id] = card
+			self._by_name.setdefault(card.name, card)
+
+	def __len__(self):
+		return len(self._cards)
+
+	def __iter__(self):
+		return iter(self._cards)
+
+	def find_id(self, cid):
+		"""
+		:param cid: The card's id.
+		:type cid: str or int
+		:returns: A YugiohCard object, or None if the id is not in the catalog
+		"""
+		return self._by_id.get(_card_id(cid))
+
+	def find_name(self, name):
+		"""
+		:param name: The card's name.
+		:type name: str
+		:returns: A YugiohCard object, or None if the name is not in the catalog
+		"""
+		return self._by_name.get(name)
+
+	def table(self):
+		"""
+		:returns: the catalog as a columnar.CardTable, built the first time it is asked for.
+		"""
+		if self._table is None:
+			self._table = columnar.CardTable(self._cards)
+		return self._table
+
+	def select(self, expr):
+		"""
+		Get every card in the catalog matching a compiled yql query. Uses the columnar backend if numpy is available.
+		:param expr: the query
+		:type expr: yql.YQuery
+		:returns: iterable of YugiohCard
+		"""
+		if self.text_index is not None:
+			ids = self.text_index.narrow(expr)
+			if ids is not None:
+				return expr.filter(self._by_id[str(cid)] for cid in sorted(ids))
+		if columnar.NUMPY_EXISTS:
+			return self.table().filter(expr)
+		return expr.filter(self._cards)
+
 class YGOProDatabase(object):
-	"""a wrapper around an sqlite connection to the cards.cdb database."""
-	def __init__(self, path=None):
+	"""a wrapper around an sqlite connection to the cards.cdb database.
+
+	If catalog is True, the whole database is read into a CardCatalog the first time a card is needed, and every lookup after that is served from memory.
+
+	If text_index is also True, the catalog gets a textindex.TextIndex over card names and text. The index is saved next to the database as cards.cdb.textindex and rebuilt whenever the database changes.
+
+	If cache_path is given, the catalog is loaded from a cardcache snapshot at that path when it is up to date, and the snapshot is rewritten when it is not. Giving a cache_path implies catalog."""
+	def __init__(self, path=None, catalog=False, text_index=False, cache_path=None):
 		self._path = path
 		self._connection = None
+		self._use_catalog = catalog or cache_path is not None
+		self._use_text_index = text_index
+		self._cache_path = cache_path
+		self._fingerprint = None
+		self.catalog = None
 
 	def open(self, path=None):
 		path = path or self._path
 		if path is not None:
 			try:
 				self._connection = sqlite.connect(path)
+				self._connection.create_function('REGEXP', 2, pushdown.regexp)
 			except sqlite.OperationalError as soe:
 				raise sqlite.OperationalError('unable to open database file "{0}"'.format(path))
 		else:
@@ -27,6 +149,60 @@ class YGOProDatabase(object):
 	def close(self):
 		if self._connection is not None:
 			self._connection.close()
+			self._connection = None
+
+	def load_catalog(self):
+		"""
+		Read every card into memory. Later lookups will not touch the database.
+		:returns: the CardCatalog
+		"""
+		if self.catalog is None:
+			cards = None
+			if self._cache_path is not None:
+				cards = cardcache.load(self._cache_path, self.fingerprint())
+			if cards is None:
+				cards = list(self.find_where())
+				if self._cache_path is not None:
+					try:
+						cardcache.save(self._cache_path, self.fingerprint(), cards)
+					except (IOError, OSError):
+						pass
+			self.catalog = CardCatalog(cards)
+			if self._use_text_index:
+				self.catalog.text_index = self.load_text_index()
+		return self.catalog
+
+	def fingerprint(self):
+		"""
+		:returns: the database_fingerprint of the database file, worked out once per object
+		:rtype: tuple
+		"""
+		if self._fingerprint is None:
+			self._fingerprint = database_fingerprint(self._path)
+		return self._fingerprint
+
+	def load_text_index(self):
+		"""
+		Get the text index for this database, from its index file if that is up to date, otherwise by indexing every card and saving the result.
+		:returns: the index
+		:rtype: textindex.TextIndex
+		"""
+		fingerprint = self.fingerprint()
+		index_path = self._path + '.textindex'
+		index = textindex.TextIndex.load(index_path, fingerprint)
+		if index is None:
+			index = textindex.TextIndex.build(self.all_cards(), fingerprint)
+			try:
+				index.save(index_path)
+			except (IOError, OSError):
+				# a read-only install can still use the index, just not keep it
+				pass
+		return index
+
+	def _get_catalog(self):
+		if self._use_catalog:
+			return self.load_catalog()
+		return self.catalog
 
 	def __enter__(self):
 		self.open()
@@ -41,6 +217,36 @@ class YGOProDatabase(object):
 		Get all cards in the database.
 		:returns: list of YugiohCards
 		"""
+		catalog = self._get_catalog()
+		if catalog is not None:
+			return iter(catalog)
+		return self.find_where()
+
+	def select(self, expr):
+		"""
+		Get every card in the database matching a compiled yql query.
+		:param expr: the query
+		:type expr: yql.YQuery
+		:returns: iterable of YugiohCard
+		"""
+		catalog = self._get_catalog()
+		if catalog is not None:
+			return catalog.select(expr)
+		where, params, residual = pushdown.compile_where(expr, MONSTER_TYPE, ATTRIBUTE)
+		cards = self.find_where(where, params)
+		if residual is not None:
+			return residual.filter(cards)
+		return cards
+
+	def find_where(self, where=None, params=()):
+		"""
+		Get every card whose row matches an sql condition over the texts and datas tables.
+		:param where: an sql expression, or None for every card
+		:type where: str
+		:param params: values for the ? placeholders in where
+		:type params: sequence
+		:returns: iterator of YugiohCards
+		"""
 		if self._connection is None:
 			self.open()
 		cursor = self._connection.cursor()
@@ -48,11 +254,11 @@ class YGOProDatabase(object):
 			SELECT texts.name, texts.desc, datas.*
 			FROM texts, datas
 			WHERE texts.id = datas.id AND datas.ot != 4'''
-		cursor.execute(query)
-		output = []
+		if where is not None:
+			query += ' AND ({0})'.format(where)
+		cursor.execute(query, list(params))
 		for row in cursor:
 			yield self.__make_card(row)
-		
 
 	def find_id(self, cid):
 		"""
@@ -61,6 +267,12 @@ class YGOProDatabase(object):
 		:type cid: str or int
 		:returns: A YugiohCard object
 		"""
+		catalog = self._get_catalog()
+		if catalog is not None:
+			card = catalog.find_id(cid)
+			if card is None:
+				raise CardNotFoundException('Could not find card with id#{0}'.format(cid))
+			return card
 		if self._connection is None:
 			self.open()
 		cursor = self._connection.cursor()
@@ -80,6 +292,12 @@ class YGOProDatabase(object):
 		:type cid: str
 		:returns: A YugiohCard object
 		"""
+		catalog = self._get_catalog()
+		if catalog is not None:
+			card = catalog.find_name(name)
+			if card is None:
+				raise CardNotFoundException('Could not find card with name "{0}"'.format(name))
+			return card
 		if self._connection is None:
 			self.open()
 		cursor = self._connection.cursor()
@@ -93,6 +311,75 @@ class YGOProDatabase(object):
 			return card
 		raise CardNotFoundException('Could not find card with name "{0}"'.format(name))
 
+	def find_ids(self, cids):
+		"""
+		Get many cards by id with a single query.
+		:param cids: The card ids. Duplicates are only looked up once.
+		:type cids: iterable of str or int
+		:returns: dict of str id, as given, to YugiohCard
+		:raises CardsNotFoundException: if any id is missing, listing every missing id.
+		"""
+		keys = _unique(str(cid) for cid in cids)
+		catalog = self._get_catalog()
+		if catalog is not None:
+			found = dict((key, catalog.find_id(key)) for key in keys)
+		else:
+			# query the stored form of every id, then answer under the ids as given
+			cards = self._find_many('texts.id', _unique(_card_id(key) for key in keys), lambda card: card.id)
+			found = dict((key, cards.get(_card_id(key))) for key in keys)
+		missing = [key for key in keys if found.get(key) is None]
+		if missing:
+			message = 'Could not find cards with ids {0}'.format(', '.join('#' + key for key in missing))
+			raise CardsNotFoundException(message, missing)
+		return found
+
+	def find_names(self, names):
+		"""
+		Get many cards by name with a single query.
+		:param names: The card names. Duplicates are only looked up once.
+		:type names: iterable of str
+		:returns: dict of name to YugiohCard
+		:raises CardsNotFoundException: if any name is missing, listing every missing name.
+		"""
+		keys = _unique(names)
+		catalog = self._get_catalog()
+		if catalog is not None:
+			found = dict((key, catalog.find_name(key)) for key in keys)
+		else:
+			found = self._find_many('texts.name', keys, lambda card: card.name)
+		missing = [key for key in keys if found.get(key) is None]
+		if missing:
+			message = 'Could not find cards with names {0}'.format(', '.join('"{0}"'.format(key) for key in missing))
+			raise CardsNotFoundException(message, missing)
+		return found
+
+	def _find_many(self, column, keys, get_key):
+		if len(keys) == 0:
+			return {}
+		if self._connection is None:
+			self.open()
+		cursor = self._connection.cursor()
+		if len(keys) <= MAX_QUERY_PARAMETERS:
+			query = '''
+				SELECT texts.name, texts.desc, datas.*
+				FROM texts, datas
+				WHERE texts.id = datas.id AND {0} IN ({1}) AND datas.ot != 4'''.format(column, ', '.join('?' * len(keys)))
+			cursor.execute(query, keys)
+		else:
+			cursor.execute('CREATE TEMP TABLE IF NOT EXISTS lookup_keys (key)')
+			cursor.execute('DELETE FROM lookup_keys')
+			cursor.executemany('INSERT INTO lookup_keys VALUES (?)', ((key,) for key in keys))
+			query = '''
+				SELECT texts.name, texts.desc, datas.*
+				FROM texts, datas, lookup_keys
+				WHERE texts.id = datas.id AND {0} = lookup_keys.key AND datas.ot != 4'''.format(column)
+			cursor.execute(query)
+		found = {}
+		for row in cursor.fetchall():
+			card = self.__make_card(row)
+			found.setdefault(get_key(card), card)
+		return found
+
 	def __make_card(self, row):
 		card = {}
 		card['name'] = row[0]
@@ -193,6 +480,10 @@ class YGOProCard(card.YugiohCard):
 	:ivar setcode: This marks what archetype a card belongs to. If two cards have the same setcode, they belong to the same archetypes. The reverse is not neccesarily true.
 	:vartype setcode: int"""
 	
+	__slots__ = ('availability', 'alias', 'setcode')
+
+	KEYS = card.YugiohCard.KEYS.union(['availability', 'alias', 'setcode'])
+
 	def __init__(self, attr):
 		"""Construct a new YugiohCard with a database row.
 
@@ -205,18 +496,6 @@ class YGOProCard(card.YugiohCard):
 			attr['attack'], attr['defense'], attr['level'],
 			attr['left_scale'], attr['right_scale'])
 
-		self.properties['availability'] = attr['availability']
-		self.properties['alias'] = attr['alias']
-		self.properties['setcode'] = attr['setcode']
-
-	@property
-	def availability(self):
-		return self.__availability
-
-	@property
-	def alias(self):
-		return self._alias
-
-	@property
-	def setcode(self):
-		return self.__setcode
+		self.availability = attr['availability']
+		self.alias = attr['alias']
+		self.setcode = attr['setcode']
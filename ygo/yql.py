@@ -1,15 +1,17 @@
-PYPARSING_EXISTS = True
-try:
-	import pyparsing
-	from pyparsing import Word, Literal, CaselessKeyword, MatchFirst, Group, Optional
-except ImportError:
-	PYPARSING_EXISTS = False
 import re
+import string
+import collections
+import threading
+
+from .card import CATEGORY_BITS
 
 CARD_KEYS = [ 'name', 'text', 'category',
 		'level', 'left_scale', 'right_scale', 'scale',
 		'attack', 'defense', 'type', 'attribute' ]
 
+# keys that always hold a number (or None), never a string
+NUMERIC_KEYS = [ 'level', 'scale', 'attack', 'defense' ]
+
 CARD_PROPERTIES = [ 'monster', 'spell', 'trap',
 		'normal', 'effect', 'fusion',
 		'xyz', 'synchro', 'ritual',
@@ -20,12 +22,20 @@ CARD_PROPERTIES = [ 'monster', 'spell', 'trap',
 
 SYNTAX = None
 
+class YQLSyntaxError(RuntimeError):
+	pass
+
 def _syntax():
+	# The pyparsing grammar. compile_yql uses the hand written _Parser instead,
+	# this is kept as the reference implementation it is tested against.
 	global SYNTAX
 
 	if SYNTAX != None:
 		return SYNTAX
 
+	import pyparsing
+	from pyparsing import Word, Literal, CaselessKeyword, MatchFirst, Group, Optional
+
 	number = Word("0123456789")
 
 	string = pyparsing.dblQuotedString
@@ -111,9 +121,14 @@ class KeyVariable(Atom):
 		return card[self.value]
 
 class CategoryVariable(Atom):
+	def __init__(self, v):
+		Atom.__init__(self, v)
+		self.bit = CATEGORY_BITS.get(v)
 	def __str__(self):
 		return '(is? {})'.format(self.value)
 	def __call__(self, card):
+		if self.bit is not None:
+			return (card['category_code'] & self.bit) != 0
 		return self.value.capitalize() in card['category']
 
 class Binary(YQuery):
@@ -125,13 +140,21 @@ class GreaterThan(Binary):
 	def __str__(self):
 		return '(> {} {})'.format(self.a, self.b)
 	def __call__(self, card):
-		return self.a(card) > self.b(card)
+		try:
+			return self.a(card) > self.b(card)
+		except TypeError:
+			# cards without the value (a spell's attack) never compare
+			return False
 
 class LessThan(Binary):
 	def __str__(self):
 		return '(< {} {})'.format(self.a, self.b)
 	def __call__(self, card):
-		return self.a(card) < self.b(card)
+		try:
+			return self.a(card) < self.b(card)
+		except TypeError:
+			# cards without the value (a spell's attack) never compare
+			return False
 
 class Equal(Binary):
 	def __str__(self):
@@ -139,10 +162,66 @@ class Equal(Binary):
 	def __call__(self, card):
 		return self.a(card) == self.b(card)
 
+# characters that make a pattern more than a plain substring
+REGEX_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+PATTERNS = {}
+MAX_PATTERNS = 1024
+
+def compile_pattern(pattern):
+	"""
+	Compile a match pattern once. Patterns without any regex syntax are tested with a plain substring check.
+	:param pattern: a regular expression
+	:type pattern: str
+	:returns: a function that takes a string and tells whether the pattern appears anywhere in it
+	"""
+	search = PATTERNS.get(pattern)
+	if search is None:
+		if REGEX_CHARS.isdisjoint(pattern):
+			search = lambda value: pattern in value
+		else:
+			regex = re.compile(pattern)
+			search = lambda value: regex.search(value) is not None
+		if len(PATTERNS) >= MAX_PATTERNS:
+			PATTERNS.clear()
+		PATTERNS[pattern] = search
+	return search
+
 class Match(Binary):
+	def __init__(self, a, b):
+		Binary.__init__(self, a, b)
+		# settle as much as possible now instead of once per card
+		self.search = None
+		if isinstance(b, String):
+			if isinstance(a, KeyVariable) and a.value in NUMERIC_KEYS:
+				# a number never matches a string
+				self._evaluate = self._never
+			else:
+				self.search = compile_pattern(b.value)
+				self._evaluate = self._search
+		elif isinstance(b, Integer):
+			# a number is never a pattern, so it is compared for equality
+			self._evaluate = self._equal
+		else:
+			self._evaluate = self._dynamic
 	def __str__(self):
 		return '(match {} {})'.format(self.a, self.b)
 	def __call__(self, card):
+		return self._evaluate(card)
+
+	def _never(self, card):
+		return False
+
+	def _equal(self, card):
+		return self.a(card) == self.b.value
+
+	def _search(self, card):
+		value = self.a(card)
+		if isinstance(value, str):
+			return 1 if self.search(value) else 0
+		return value == self.b.value
+
+	def _dynamic(self, card):
 		value = self.a(card)
 		pattern = self.b(card)
 		try:
@@ -162,21 +241,271 @@ class And(Binary):
 
 class Or(Binary):
 	def __str__(self):
-		return '({} and {})'.format(self.a, self.b)
+		return '({} or {})'.format(self.a, self.b)
 	def __call__(self, card):
-		return self.a(card) and self.b(card)
+		return self.a(card) or self.b(card)
 	
 
+# splits query text into the parts outside and inside double quoted strings
+QUOTED_STRING = re.compile(r'("(?:[^"\\]|\\.)*")')
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_query(text):
+	"""
+	Collapse the whitespace of a query outside of its quoted strings, so that equivalent query texts share a cache entry.
+	:param text: a yql query
+	:type text: str
+	:rtype: str
+	"""
+	parts = QUOTED_STRING.split(text)
+	for i in range(0, len(parts), 2):
+		parts[i] = WHITESPACE.sub(' ', parts[i])
+	return ''.join(parts).strip()
+
+class QueryCache(object):
+	"""A bounded least recently used cache of compiled queries, keyed by normalized query text.
+
+	Compiled queries hold no per-card state, so a cached query is safe to share between callers and threads.
+
+	:ivar maxsize: the most queries kept at once
+	:vartype maxsize: int
+	:ivar hits: lookups answered from the cache
+	:vartype hits: int
+	:ivar misses: lookups that had to compile the query
+	:vartype misses: int"""
+	def __init__(self, maxsize=512):
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self._queries = collections.OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		return len(self._queries)
+
+	def compile(self, text):
+		"""
+		Get the compiled form of a query, compiling it only if it is not already cached.
+		:param text: a yql query
+		:type text: str
+		:rtype: YQuery
+		"""
+		key = normalize_query(text)
+		with self._lock:
+			expr = self._queries.pop(key, None)
+			if expr is not None:
+				self.hits += 1
+				self._queries[key] = expr
+				return expr
+			self.misses += 1
+		expr = _compile(key)
+		with self._lock:
+			self._queries[key] = expr
+			while len(self._queries) > self.maxsize:
+				self._queries.popitem(last=False)
+		return expr
+
+	def warm(self, path):
+		"""
+		Compile every query in a file ahead of time. The file holds one query per line. Blank lines and lines starting with # are skipped.
+		:param path: path to the file of queries
+		:type path: str
+		:returns: the number of queries compiled
+		:rtype: int
+		"""
+		count = 0
+		with open(path, 'r') as fl:
+			for line in fl:
+				line = line.strip()
+				if line and not line.startswith('#'):
+					self.compile(line)
+					count += 1
+		return count
+
+	def clear(self):
+		with self._lock:
+			self._queries.clear()
+			self.hits = 0
+			self.misses = 0
+
+	def info(self):
+		"""
+		:returns: the cache's hits, misses, size and maxsize.
+		:rtype: dict
+		"""
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'size': len(self._queries),
+			'maxsize': self.maxsize,
+		}
+
+CACHE = QueryCache()
+
+def cache_info():
+	"""
+	:returns: the hits, misses, size and maxsize of the compiled query cache used by compile_yql.
+	:rtype: dict
+	"""
+	return CACHE.info()
+
+def warm_cache(path):
+	"""
+	Pre-compile a file of known queries, one per line, into the cache used by compile_yql.
+	:returns: the number of queries compiled
+	:rtype: int
+	"""
+	return CACHE.warm(path)
+
 def compile_yql(text):
-	if not PYPARSING_EXISTS:
-		raise ImportError("No module named 'pyparsing'")
 	if isinstance(text, YQuery):
 		return text
 	else:
-		parser = _syntax()
-		result = parser.parseString(text)
-		expr = _compile_expression(result['Expression'])
-		return expr
+		return CACHE.compile(text)
+
+def _compile(text):
+	return _Parser(text).parse()
+
+def compile_yql_pyparsing(text):
+	"""
+	Compile a query with the original pyparsing grammar. Needs pyparsing installed. The result is the same as compile_yql, just slower; it is only kept to check the hand written parser against.
+	:param text: a yql query
+	:type text: str
+	:rtype: YQuery
+	"""
+	parser = _syntax()
+	result = parser.parseString(text)
+	expr = _compile_expression(result['Expression'])
+	return expr
+
+# character classes of the pyparsing grammar
+WHITE_CHARS = frozenset(' \n\t\r')
+DIGIT_CHARS = frozenset(string.digits)
+SYMBOL_CHARS = frozenset(string.ascii_letters + '-')
+KEYWORD_CHARS = frozenset(string.ascii_letters + string.digits + '_$')
+DOUBLE_QUOTED = re.compile(r'"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*')
+COMPARATORS = frozenset('=<>~')
+
+BOOL_WORDS = CARD_PROPERTIES + ['true', 'false']
+LOGICAL_WORDS = ['and', 'or']
+NOT_WORDS = ['not']
+
+class _Parser(object):
+	"""A recursive descent parser for yql.
+
+	It accepts exactly the language of the pyparsing grammar in _syntax, and builds the same trees:
+	whitespace is skipped before every token, keywords are caseless and cannot touch a letter, digit, _ or $,
+	a bare word becomes a string, and text after the first complete expression is ignored.
+
+	Every method takes a position in the text and returns a (result, position after it) pair, or None if nothing matched there."""
+	def __init__(self, text):
+		self.text = text.expandtabs()
+		self.length = len(self.text)
+
+	def parse(self):
+		result = self.expression(0)
+		if result is None:
+			raise YQLSyntaxError('Could not parse yql query "{0}"'.format(self.text))
+		return result[0]
+
+	def skip(self, loc):
+		while loc < self.length and self.text[loc] in WHITE_CHARS:
+			loc += 1
+		return loc
+
+	def keyword(self, loc, words):
+		loc = self.skip(loc)
+		if loc > 0 and self.text[loc-1] in KEYWORD_CHARS:
+			return None
+		for word in words:
+			end = loc + len(word)
+			if self.text[loc:end].lower() == word and (end >= self.length or self.text[end] not in KEYWORD_CHARS):
+				return (word, end)
+		return None
+
+	def word(self, loc, chars):
+		loc = self.skip(loc)
+		end = loc
+		while end < self.length and self.text[end] in chars:
+			end += 1
+		if end == loc:
+			return None
+		return (self.text[loc:end], end)
+
+	def quoted(self, loc):
+		loc = self.skip(loc)
+		match = DOUBLE_QUOTED.match(self.text, loc)
+		if match is None:
+			return None
+		end = match.end()
+		if end >= self.length or self.text[end] != '"':
+			return None
+		return (self.text[loc:end+1], end+1)
+
+	def atom(self, loc):
+		result = self.keyword(loc, CARD_KEYS)
+		if result is None:
+			result = self.keyword(loc, BOOL_WORDS)
+		if result is None:
+			result = self.quoted(loc)
+		if result is None:
+			symbol = self.word(loc, SYMBOL_CHARS)
+			if symbol is not None:
+				result = ('"{0}"'.format(symbol[0]), symbol[1])
+		if result is None:
+			result = self.word(loc, DIGIT_CHARS)
+		return result
+
+	def comparator(self, loc):
+		loc = self.skip(loc)
+		if loc < self.length and self.text[loc] in COMPARATORS:
+			return (self.text[loc], loc+1)
+		return None
+
+	def constraint(self, loc):
+		# a ~ b, a = b, a < b, a > b
+		lhand = self.atom(loc)
+		if lhand is not None:
+			op = self.comparator(lhand[1])
+			if op is not None:
+				rhand = self.atom(op[1])
+				if rhand is not None:
+					return (_make_constraint(op[0], lhand[0], rhand[0]), rhand[1])
+
+		# key value, an implicit match
+		key = self.keyword(loc, CARD_KEYS)
+		if key is not None:
+			value = self.atom(key[1])
+			if value is not None:
+				return (_make_constraint('~', key[0], value[0]), value[1])
+
+		# monster, an implicit "= true"
+		flag = self.keyword(loc, BOOL_WORDS)
+		if flag is not None:
+			return (_make_constraint('=', flag[0], 'true'), flag[1])
+
+		# not x, an implicit "= false"
+		negation = self.keyword(loc, NOT_WORDS)
+		if negation is not None:
+			value = self.atom(negation[1])
+			if value is not None:
+				return (_make_constraint('=', value[0], 'false'), value[1])
+		return None
+
+	def expression(self, loc):
+		first = self.constraint(loc)
+		if first is None:
+			return None
+		lhand, loc = first
+		op = self.keyword(loc, LOGICAL_WORDS)
+		if op is not None:
+			rest = self.expression(op[1])
+			if rest is not None:
+				if op[0] == 'and':
+					return (And(lhand, rest[0]), rest[1])
+				else:
+					return (Or(lhand, rest[0]), rest[1])
+		return (lhand, loc)
 
 def _compile_expression(result):
 	lhand = _compile_constraint(result['Constraint'])
@@ -190,9 +519,11 @@ def _compile_expression(result):
 	return lhand
 
 def _compile_constraint(result):
-	op = result['Comparator']
-	lhand = _compile_atom(result['LHand'])
-	rhand = _compile_atom(result['RHand'])
+	return _make_constraint(result['Comparator'], result['LHand'], result['RHand'])
+
+def _make_constraint(op, lhand, rhand):
+	lhand = _compile_atom(lhand)
+	rhand = _compile_atom(rhand)
 	if op == '=':
 		return Equal(lhand, rhand)
 	elif op == '<':
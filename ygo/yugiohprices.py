@@ -1,29 +1,112 @@
 import sys, re
+import threading
+from multiprocessing.pool import ThreadPool
 from . import abstract, card
+
+if sys.version_info.major == 2:
+	from urlparse import urlparse
+else:
+	from urllib.parse import urlparse
+
+# where card prices are looked up. Point this at another server (a local stub, for instance) to fetch from there instead.
+API_URL = "http://yugiohprices.com/api/get_card_prices/"
+
+# the most requests fetched at once by get_price_data_many
+MAX_WORKERS = 8
+
+# the most requests to one host at once, across every get_price_data_many call
+PER_HOST = 4
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
 	
 class APIError(RuntimeError):
 	pass
 
+def price_url(card):
+	"""
+	:returns: the url of the price data of a card
+	:rtype: str
+	"""
+	return API_URL + abstract.quote_plus(card.name)
 
-def get_price_data(card):
-	url = "http://yugiohprices.com/api/get_card_prices/"+abstract.quote_plus(card.name)
-	data = abstract.get_json(url)
-	output = []
+def _host_limit(url):
+	host = urlparse(url).netloc
+	with _host_limits_lock:
+		if host not in _host_limits:
+			_host_limits[host] = threading.BoundedSemaphore(PER_HOST)
+		return _host_limits[host]
+
+def fetch_price_rows(card):
+	"""
+	Ask the price api about a card.
+	:returns: the api's print runs of the card, as decoded json. Empty if the api has no prices for the card.
+	:rtype: list of dict
+	"""
+	url = price_url(card)
+	with _host_limit(url):
+		data = abstract.get_json(url)
 	if 'status' in data and data['status'] == 'success':
-		data = data['data']
-		for run in data:
-			rarity = run['rarity']
-			print_tag = run['print_tag']
-			price_summary = PriceSummary()
-			listings = []
-			if 'status' in run['price_data'] and run['price_data']['status'] == 'success':
-				print_data = run['price_data']['data']
-				price_summary = PriceSummary(print_data['prices'])
-				listings = print_data['listings']
-			pcard = PrintedCard(card, print_tag, rarity, price_summary, listings)
-			output.append(pcard)
+		return data['data']
+	return []
+
+def printed_cards(card, rows):
+	"""
+	:param card: the card the rows are about
+	:type card: YugiohCard
+	:param rows: print runs, as returned by fetch_price_rows
+	:type rows: list of dict
+	:returns: the print runs as PrintedCard objects
+	:rtype: list of PrintedCard
+	"""
+	output = []
+	for run in rows:
+		rarity = run['rarity']
+		print_tag = run['print_tag']
+		price_summary = PriceSummary()
+		listings = []
+		if 'status' in run['price_data'] and run['price_data']['status'] == 'success':
+			print_data = run['price_data']['data']
+			price_summary = PriceSummary(print_data['prices'])
+			listings = print_data['listings']
+		pcard = PrintedCard(card, print_tag, rarity, price_summary, listings)
+		output.append(pcard)
 	return output
 
+def get_price_data(card):
+	return printed_cards(card, fetch_price_rows(card))
+
+def get_price_data_many(cards, max_workers=MAX_WORKERS, fetch=get_price_data):
+	"""
+	Get the price data of many cards at once, fetching them concurrently.
+	:param cards: the cards. A card that appears more than once is only fetched once.
+	:type cards: iterable of YugiohCard
+	:param max_workers: the most requests in flight at once. Requests to the same host are further limited to PER_HOST at a time.
+	:type max_workers: int
+	:param fetch: gets the price data of one card, get_price_data by default
+	:type fetch: function
+	:returns: the price data of every card, in the same order as cards
+	:rtype: list of lists of PrintedCard
+	"""
+	cards = list(cards)
+	distinct = []
+	seen = set()
+	for c in cards:
+		if c.name not in seen:
+			seen.add(c.name)
+			distinct.append(c)
+	if len(distinct) == 0:
+		return []
+	pool = ThreadPool(max(1, min(max_workers, len(distinct))))
+	try:
+		# map keeps the order of its input, whatever order the requests finish in
+		fetched = pool.map(fetch, distinct)
+	finally:
+		pool.close()
+		pool.join()
+	by_name = dict((c.name, data) for (c, data) in zip(distinct, fetched))
+	return [by_name[c.name] for c in cards]
+
 class PriceSummary(dict):
 	def __getattr__(self, key):
 		if key in self:
@@ -34,10 +117,14 @@ class PriceSummary(dict):
 		raise NotImplementedError("PriceSummary.__setitem__")
 
 class PrintedCard(card.YugiohCard):
+	__slots__ = ('rarity', 'print_tag', 'price', 'listings')
+
+	KEYS = card.YugiohCard.KEYS.union(['rarity', 'print_tag'])
+
 	def __init__(self, original, print_tag, rarity, summary, listings):
 		self.clone(original)
-		self.properties['rarity'] = rarity
-		self.properties['print_tag'] = print_tag
+		self.rarity = rarity
+		self.print_tag = print_tag
 		self.price = summary
 		self.listings = listings
 	def __hash__(self):